@@ -1,17 +1,308 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from weakref import WeakKeyDictionary
 from typing import Annotated
 
 from fastapi import Depends
-from sqlmodel import Session, SQLModel, create_engine
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-slqite_db_name = "joban-data.db"
+from app.migrations import latest_version
+from app.query_stats import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# Relative to the working directory unless absolute, e.g. on a volume of the container
+slqite_db_name = os.environ.get("JOBAN_DB_PATH", "joban-data.db")
 sqlite_url = f"sqlite:///{slqite_db_name}"
+async_sqlite_url = f"sqlite+aiosqlite:///{slqite_db_name}"
+
+# PRAGMA values applied to every new connection, picked by JOBAN_SQLITE_PROFILE.
+# A single pragma can be overridden with JOBAN_SQLITE_<NAME>, e.g. JOBAN_SQLITE_CACHE_SIZE=-131072
+sqlite_pragma_names = ["journal_mode", "synchronous", "cache_size", "mmap_size",
+                       "busy_timeout", "foreign_keys", "temp_store"]
+# Foreign keys are on in every profile: deleting boards and columns relies on ON DELETE CASCADE.
+sqlite_profiles = {
+    "default": {
+        "foreign_keys": "ON",
+    },
+    "performance": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+        "foreign_keys": "ON",
+        "temp_store": "MEMORY",
+    },
+}
+sqlite_profile = os.environ.get("JOBAN_SQLITE_PROFILE", "performance")
+
+
+def sqlite_pragmas(profile: str = sqlite_profile) -> dict:
+    pragmas = dict(sqlite_profiles[profile])
+    for name in sqlite_pragma_names:
+        value = os.environ.get(f"JOBAN_SQLITE_{name.upper()}")
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+
+def use_sqlite_pragmas(sync_engine, pragmas: dict):
+    """
+    Registers a connect hook on the engine which applies the pragmas to each new connection.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_conn, conn_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+class WriteIntent:
+    """
+    Marks the next transaction begun in the current context as a write, see expect_write.
+    """
+    __slots__ = ("pending", "lock")
+
+    def __init__(self, lock: asyncio.Lock | None):
+        self.pending = True
+        self.lock = lock
+
+
+write_intent: ContextVar[WriteIntent | None] = ContextVar("write_intent", default=None)
+
+
+def expect_write(lock: asyncio.Lock | None = None) -> WriteIntent:
+    """
+    Makes the next transaction begun in the current context a write transaction.
+
+    Called by LockRetryRoute for requests with writing methods and by background jobs before
+    their writes. Only the next transaction: the reads after a commit, like a refresh,
+    begin deferred again and don't hold the write lock until the session is closed.
+
+    Args:
+        lock (asyncio.Lock | None): A lock the caller acquired, handed over to the transaction
+            and released when its connection goes back to the pool.
+    """
+    intent = WriteIntent(lock)
+    write_intent.set(intent)
+    return intent
+
+
+
+@asynccontextmanager
+async def write_lock_released():
+    """
+    Gives the write lock of the request back while the block runs, for slow work without the
+    database before the first transaction, like hashing a password. The lock is taken again,
+    in turn with the other writes, before the block returns.
+    """
+    intent = write_intent.get()
+    lock = intent.lock if intent is not None and intent.pending else None
+    if lock is None:
+        yield
+        return
+    lock.release()
+    try:
+        yield
+    finally:
+        try:
+            await lock.acquire()
+        except BaseException:
+            # Not held anymore, LockRetryRoute must not release it
+            intent.lock = None
+            raise
+
+def use_immediate_writes(sync_engine):
+    """
+    Registers hooks on the engine which begin write transactions with BEGIN IMMEDIATE.
+
+    The driver's own transaction handling is turned off, SQLAlchemy emits BEGIN instead.
+    A write transaction takes the write lock up front and waits for it within busy_timeout,
+    rather than reading first and failing with "database is locked" at its first write
+    once another connection committed. Reads stay deferred and don't block writers in WAL mode.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def disable_driver_transactions(dbapi_conn, conn_record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(sync_engine, "begin")
+    def begin(conn):
+        intent = write_intent.get()
+        write = intent is not None and intent.pending
+        if write:
+            intent.pending = False
+            if intent.lock is not None:
+                conn.info["write_lock"], intent.lock = intent.lock, None
+        # On the DBAPI cursor, so BEGIN isn't counted as a query, like the driver's own wasn't
+        cursor = conn.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        cursor.close()
+
+    @event.listens_for(sync_engine, "checkin")
+    @event.listens_for(sync_engine, "invalidate")
+    def release_write_lock(dbapi_conn, conn_record, *args):
+        lock = conn_record.info.pop("write_lock", None)
+        if lock is not None:
+            lock.release()
+
+
+def configure_engine(sync_engine, pragmas: dict | None = None):
+    """
+    Sets an engine up like the app's: the pragma profile, BEGIN IMMEDIATE for write
+    transactions with the write lock handed over to them, and the query statistics.
+    Benchmarks and tests use it for their own engines, so they measure the same write path.
+    """
+    use_sqlite_pragmas(sync_engine, sqlite_pragmas() if pragmas is None else pragmas)
+    use_immediate_writes(sync_engine)
+    instrument_engine(sync_engine)
+
 
 connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, connect_args=connect_args)
+async_engine = create_async_engine(async_sqlite_url, connect_args=connect_args)
+configure_engine(engine)
+configure_engine(async_engine.sync_engine)
+
+
+def pool_stats() -> dict:
+    """
+    Returns the connection pool counters of the async engine, exported on /metrics.
+    """
+    pool = async_engine.pool
+    return {
+        "size": pool.size() if hasattr(pool, "size") else 1,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else 0,
+    }
+
+
+# How often a request failing with "database is locked" is run again, and the first backoff
+lock_retries = int(os.environ.get("JOBAN_DB_LOCK_RETRIES", "5"))
+lock_retry_ms = float(os.environ.get("JOBAN_DB_LOCK_RETRY_MS", "10"))
+# Per event loop, the writing requests of this process queue up here in order before they
+# take a pooled connection, rather than polling SQLite's lock, where some would starve
+write_locks: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = WeakKeyDictionary()
+
+
+def check_schema_version(engine=engine):
+    """
+    Fails unless the database was migrated to the schema version of this code.
+
+    It is the only schema work at startup, a single query: the tables are created and changed
+    by running python -m app.migrations once per release. The multi-worker server checks in
+    the master before forking, the connection is closed again so the workers don't share it.
+    """
+    try:
+        with engine.connect() as conn:
+            version = conn.exec_driver_sql("SELECT max(version) FROM schema_version").scalar() or 0
+    except OperationalError as error:
+        if "no such table" not in str(error):
+            raise
+        version = 0
+    finally:
+        engine.dispose()
+    if version < latest_version:
+        raise RuntimeError(f"Database schema version {version} is older than {latest_version}, "
+                           f"run python -m app.migrations")
+    if version > latest_version:
+        logger.warning("Database schema version %s is newer than %s of this code", version, latest_version)
+
+
+def is_lock_error(error: Exception) -> bool:
+    # The BEGIN of use_immediate_writes fails with the driver's error, unwrapped
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and "database is locked" in str(error)
 
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+# The scope keys FastAPI keeps the exit stacks of a request's dependencies in. They are private
+# to FastAPI: checked against the version pinned in requirements.txt (0.135), and by
+# test_db.test_fastapi_exit_stacks, so an upgrade which moves them fails the tests
+fastapi_exit_stack_keys = ("fastapi_inner_astack", "fastapi_function_astack")
+
+
+def swap_exit_stacks(scope: dict, stacks: tuple[AsyncExitStack, ...]) -> tuple[AsyncExitStack, ...]:
+    """
+    Puts other exit stacks into the request scope for the dependencies, returns the ones it replaced.
+
+    Raises:
+        RuntimeError: If FastAPI didn't put its exit stacks into the scope. The dependencies, like
+            the session of an attempt, would be cleaned up with stacks LockRetryRoute doesn't know.
+    """
+    missing = [key for key in fastapi_exit_stack_keys if key not in scope]
+    if missing:
+        raise RuntimeError(f"No {', '.join(missing)} in the request scope, LockRetryRoute doesn't "
+                           f"support this FastAPI version")
+    replaced = tuple(scope[key] for key in fastapi_exit_stack_keys)
+    scope.update(zip(fastapi_exit_stack_keys, stacks))
+    return replaced
+
+class LockRetryRoute(APIRoute):
+    """
+    Route which makes the first transaction of requests with writing methods a write
+    transaction (see expect_write) and runs the endpoint again when SQLite reports
+    "database is locked". Writing requests first wait for their turn on the write lock
+    of the process, which their transaction releases when its connection goes back to
+    the pool, so other workers are the only ones left to wait for in busy_timeout.
+
+    A deferred transaction which read first fails at its first write if another connection,
+    in this process or another worker, committed in the meantime, without waiting for
+    busy_timeout. BEGIN IMMEDIATE avoids that, a lock still held after busy_timeout or a
+    request writing with a GET fails the same way. Running it again on a fresh session reads
+    the new state. Each attempt gets its own exit stacks, so the session of a failed attempt is
+    closed and rolled back before the next one; staged board events are dropped with it.
+    The request body is received before the write lock is taken and cached by the Request,
+    nothing has been sent yet.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def retrying_handler(request):
+            for attempt in range(lock_retries + 1):
+                attempt_inner, attempt_function = AsyncExitStack(), AsyncExitStack()
+                inner_stack, function_stack = swap_exit_stacks(request.scope, (attempt_inner, attempt_function))
+                intent = None
+                if request.method not in ("GET", "HEAD", "OPTIONS"):
+                    # Received before queueing up: a slow upload must not hold up the other writes.
+                    # The Request keeps the body for the endpoint and for the next attempts.
+                    await request.body()
+                    lock = write_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+                    await lock.acquire()
+                    intent = expect_write(lock)
+                retry = False
+                try:
+                    return await handler(request)
+                except Exception as error:
+                    if not is_lock_error(error) or attempt == lock_retries:
+                        raise
+                    retry = True
+                finally:
+                    if intent is not None and intent.lock is not None:
+                        # No transaction took the lock over
+                        intent.lock.release()
+                    swap_exit_stacks(request.scope, (inner_stack, function_stack))
+                    if retry:
+                        await attempt_function.aclose()
+                        await attempt_inner.aclose()
+                    else:
+                        # Cleaned up with the request's stacks, and with its exception, as before
+                        await function_stack.enter_async_context(attempt_function)
+                        await inner_stack.enter_async_context(attempt_inner)
+                logger.info("Database locked, retrying %s %s", request.method, self.path)
+                await asyncio.sleep(lock_retry_ms / 1000 * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        return retrying_handler
 
 
 def get_session():
@@ -19,4 +310,10 @@ def get_session():
         yield session
 
 
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
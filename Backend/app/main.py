@@ -1,17 +1,32 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from app.db import create_db_and_tables
+from app.db import check_schema_version, pool_stats
+from app.metrics import MetricsMiddleware, metrics, metrics_enabled
+from app.query_stats import QueryStatsMiddleware, query_totals
+from app.profiling import ProfilingMiddleware, profiling_enabled
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routers import auth
 from app.routers import boards
+from app.routers import board_changes
+from app.routers.auth_cache import token_cache
+from app.routers.boards_cache import board_cache
+from app.routers.board_events import board_broadcaster, events_poll_interval
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    check_schema_version()
+    token_sweeper = asyncio.create_task(auth.sweep_expired_tokens())
+    change_log_sweeper = asyncio.create_task(board_changes.sweep_change_log())
+    change_log_tailer = asyncio.create_task(board_changes.tail_change_log()) if events_poll_interval else None
     yield
+    token_sweeper.cancel()
+    change_log_sweeper.cancel()
+    if change_log_tailer:
+        change_log_tailer.cancel()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router)
@@ -30,9 +45,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+app.add_middleware(QueryStatsMiddleware)
+if profiling_enabled:
+    # Not even installed otherwise, so unprofiled deployments don't pay for the header check
+    app.add_middleware(ProfilingMiddleware)
+if metrics_enabled:
+    # Added last, so it is the outermost middleware and times the whole stack
+    app.add_middleware(MetricsMiddleware)
+metrics.collect("joban_token_cache", token_cache.stats)
+metrics.collect("joban_board_cache", board_cache.stats)
+metrics.collect("joban_board_events", board_broadcaster.stats)
+metrics.collect("joban_db_pool", pool_stats)
+metrics.collect("joban_db", query_totals)
+
 
 @app.get("/", response_class=PlainTextResponse)
 async def root():
     return "Hello from Joban API"
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Serves request, cache and database pool metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,124 @@
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+metrics_enabled = os.environ.get("JOBAN_METRICS", "1") != "0"
+
+# Upper bounds of the histogram buckets, in seconds and in bytes
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+size_buckets = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {total}")
+        return lines
+
+
+class Metrics:
+    """
+    In-process request metrics, rendered in the Prometheus text format.
+
+    Everything runs on the event loop thread, so plain counters need no locking.
+    Gauges of other components are read from their stats() when rendering.
+    """
+
+    def __init__(self):
+        self.latency = defaultdict(lambda: Histogram(latency_buckets))
+        self.size = defaultdict(lambda: Histogram(size_buckets))
+        self.statuses = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        self.collectors = []
+
+    def collect(self, prefix: str, stats):
+        """
+        Exports the numeric values of a stats() dict as gauges named <prefix>_<key>.
+
+        Args:
+            prefix (str): Metric name prefix, e.g. joban_token_cache.
+            stats (Callable[[], dict]): Called on every scrape.
+        """
+        self.collectors.append((prefix, stats))
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int):
+        self.latency[method, route].observe(seconds)
+        self.size[method, route].observe(size)
+        self.statuses[method, route, status] += 1
+
+    def render(self) -> str:
+        lines = ["# HELP joban_http_requests_in_flight Requests being handled.",
+                 "# TYPE joban_http_requests_in_flight gauge"]
+        lines += [f'joban_http_requests_in_flight{{method="{method}"}} {count}'
+                  for method, count in self.in_flight.items()]
+        lines += ["# HELP joban_http_requests_total Finished requests by route and status.",
+                  "# TYPE joban_http_requests_total counter"]
+        lines += [f'joban_http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}'
+                  for (method, route, status), count in self.statuses.items()]
+        for name, help, histograms in [
+            ("joban_http_request_duration_seconds", "Request latency by route.", self.latency),
+            ("joban_http_response_size_bytes", "Response body size by route.", self.size),
+        ]:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            for (method, route), histogram in histograms.items():
+                lines += histogram.render(name, f'method="{method}",route="{route}"')
+        for prefix, stats in self.collectors:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request and counting its status and body size.
+
+    Requests are labeled with the route template, e.g. /boards/{board_id}, so the number
+    of series stays bounded. Requests no route matched share the "<unmatched>" label.
+    """
+
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        start = time.perf_counter()
+        response = {"status": 500, "size": 0}
+
+        async def send_counted(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight[method] += 1
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            self.registry.in_flight[method] -= 1
+            route = scope.get("route")
+            self.registry.observe(method, route.path if route else "<unmatched>", response["status"],
+                                  time.perf_counter() - start, response["size"])
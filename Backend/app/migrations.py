@@ -0,0 +1,357 @@
+"""
+Versioned schema migrations of the SQLite database. Run from the Backend directory before
+starting a new release:
+
+    python -m app.migrations            # applies the pending migrations
+    python -m app.migrations --check    # only reports the version, exits with 1 if behind
+
+The applied versions are recorded in the schema_version table, the app only compares the
+newest of them with latest_version at startup (see app.db.check_schema_version) instead of
+creating the tables. Each migration runs in its own transaction and brings every table it
+touches to the state of the models, checking what is there first: databases which had their
+tables created by earlier releases, before this table existed, converge to the same schema.
+
+SQLite can't change a column or a foreign key in place, such tables are rebuilt with
+rebuild_table. New migrations are appended to the list, never changed once released.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+from app.routers.boards_utils import rank_for_ordinal
+
+migrations = []
+
+
+def migration(func):
+    """
+    Appends the function to the migrations, its version is the position in the list.
+    """
+    migrations.append(func)
+    return func
+
+
+def columns(conn: sqlite3.Connection, table: str) -> dict[str, str]:
+    """
+    Returns the declared type of each column of the table, nothing if it doesn't exist.
+    """
+    return {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def table_sql(conn: sqlite3.Connection, table: str) -> str:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row[0] if row else ""
+
+
+def rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str, expressions: dict[str, str] = None):
+    """
+    Replaces the table with one created by create_sql, copying the rows over.
+
+    Columns present in both are copied as they are unless expressions gives the SQL computing
+    the new value. The indexes and triggers of the old table are created again. Foreign keys
+    have to be off, otherwise dropping the old table would delete or fail on the referencing rows.
+    """
+    expressions = expressions or {}
+    old_columns = columns(conn, table)
+    schema = conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+                          "AND sql IS NOT NULL", (table,)).fetchall()
+    conn.execute(create_sql.replace(f'CREATE TABLE "{table}"', f'CREATE TABLE "{table}_new"', 1))
+    copied = [name for name in columns(conn, f"{table}_new") if name in old_columns]
+    names = ", ".join(f'"{name}"' for name in copied)
+    values = ", ".join(expressions.get(name, f'"{name}"') for name in copied)
+    conn.execute(f'INSERT INTO "{table}_new" ({names}) SELECT {values} FROM "{table}"')
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{table}_new" RENAME TO "{table}"')
+    for (sql,) in schema:
+        conn.execute(sql)
+
+
+user_table = """CREATE TABLE "user" (
+    id INTEGER NOT NULL,
+    first_name VARCHAR(20) NOT NULL,
+    last_name VARCHAR(30) NOT NULL,
+    login VARCHAR(20) NOT NULL,
+    password_hash VARCHAR(128) NOT NULL,
+    salt VARCHAR(16) NOT NULL,
+    PRIMARY KEY (id)
+)"""
+
+tokenstore_table = """CREATE TABLE "tokenstore" (
+    id INTEGER NOT NULL,
+    login VARCHAR(20) NOT NULL,
+    token VARCHAR NOT NULL,
+    exp_time INTEGER NOT NULL,
+    PRIMARY KEY (id)
+)"""
+
+column_table = """CREATE TABLE "column" (
+    id INTEGER NOT NULL,
+    board_id INTEGER NOT NULL,
+    title VARCHAR(20) NOT NULL,
+    ord_num INTEGER NOT NULL,
+    rank VARCHAR NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(board_id) REFERENCES board (id) ON DELETE CASCADE
+)"""
+
+task_table = """CREATE TABLE "task" (
+    id INTEGER NOT NULL,
+    title VARCHAR(20) NOT NULL,
+    body VARCHAR NOT NULL,
+    ord_num INTEGER NOT NULL,
+    rank VARCHAR NOT NULL,
+    col_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(col_id) REFERENCES "column" (id) ON DELETE CASCADE
+)"""
+
+boardchange_table = """CREATE TABLE "boardchange" (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    board_id INTEGER NOT NULL,
+    op VARCHAR(20) NOT NULL,
+    data VARCHAR NOT NULL,
+    created_at INTEGER NOT NULL,
+    FOREIGN KEY(board_id) REFERENCES board (id) ON DELETE CASCADE
+)"""
+
+
+@migration
+def initial_schema(conn: sqlite3.Connection):
+    """
+    The tables of the first release.
+    """
+    conn.execute("""CREATE TABLE IF NOT EXISTS "user" (
+        id INTEGER NOT NULL,
+        first_name VARCHAR(20) NOT NULL,
+        last_name VARCHAR(30) NOT NULL,
+        login VARCHAR(20) NOT NULL,
+        password_hash VARCHAR(64) NOT NULL,
+        salt VARCHAR(16) NOT NULL,
+        PRIMARY KEY (id)
+    )""")
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_user_login ON "user" (login)')
+    conn.execute("""CREATE TABLE IF NOT EXISTS tokenstore (
+        id INTEGER NOT NULL,
+        login VARCHAR(20) NOT NULL,
+        token VARCHAR NOT NULL,
+        exp_time VARCHAR NOT NULL,
+        PRIMARY KEY (id)
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_tokenstore_token ON tokenstore (token)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS board (
+        id INTEGER NOT NULL,
+        title VARCHAR(20) NOT NULL,
+        PRIMARY KEY (id)
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS "column" (
+        id INTEGER NOT NULL,
+        board_id INTEGER NOT NULL,
+        title VARCHAR(20) NOT NULL,
+        ord_num INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(board_id) REFERENCES board (id)
+    )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS task (
+        id INTEGER NOT NULL,
+        title VARCHAR(20) NOT NULL,
+        body VARCHAR NOT NULL,
+        ord_num INTEGER NOT NULL,
+        col_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(col_id) REFERENCES "column" (id)
+    )""")
+
+
+@migration
+def token_expiry_as_unix_time(conn: sqlite3.Connection):
+    """
+    Stores the token expiry as indexed unix time instead of an ISO local time string.
+    """
+    if columns(conn, "tokenstore")["exp_time"] != "INTEGER":
+        rebuild_table(conn, "tokenstore", tokenstore_table,
+                      {"exp_time": "CAST(strftime('%s', exp_time, 'utc') AS INTEGER)"})
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_tokenstore_exp_time ON tokenstore (exp_time)")
+
+
+@migration
+def column_and_task_ranks(conn: sqlite3.Connection):
+    """
+    Orders columns and tasks by rank strings, starting from the ranks of their order numbers.
+    """
+    conn.create_function("rank_for_ordinal", 1, rank_for_ordinal, deterministic=True)
+    for table in ("column", "task"):
+        if "rank" not in columns(conn, table):
+            conn.execute(f"ALTER TABLE \"{table}\" ADD COLUMN rank VARCHAR NOT NULL DEFAULT ''")
+        conn.execute(f"UPDATE \"{table}\" SET rank = rank_for_ordinal(ord_num) WHERE rank = ''")
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_column_board_id_rank ON "column" (board_id, rank)')
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_task_col_id_rank ON task (col_id, rank)")
+
+
+@migration
+def board_versions(conn: sqlite3.Connection):
+    """
+    Counts the writes to each board, for ETags and change polling.
+    """
+    if "version" not in columns(conn, "board"):
+        conn.execute("ALTER TABLE board ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_board_version ON board (version)")
+
+
+@migration
+def board_change_log(conn: sqlite3.Connection):
+    """
+    Logs the writes to each board, compacted up to board.changes_floor.
+    """
+    if "changes_floor" not in columns(conn, "board"):
+        conn.execute("ALTER TABLE board ADD COLUMN changes_floor INTEGER NOT NULL DEFAULT 0")
+    conn.execute(boardchange_table.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_boardchange_created_at ON boardchange (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_boardchange_board_id_id ON boardchange (board_id, id)")
+
+
+@migration
+def cascading_deletes(conn: sqlite3.Connection):
+    """
+    Deletes the columns, tasks and changes of a board with it.
+    """
+    for table, create_sql in (("column", column_table), ("task", task_table), ("boardchange", boardchange_table)):
+        if "ON DELETE CASCADE" not in table_sql(conn, table):
+            rebuild_table(conn, table, create_sql)
+
+
+@migration
+def task_search(conn: sqlite3.Connection):
+    """
+    Indexes the task titles and bodies for full-text search.
+    """
+    if table_sql(conn, "task_fts"):
+        return
+    conn.execute("CREATE VIRTUAL TABLE task_fts USING fts5(title, body, content='task', content_rowid='id', "
+                 "tokenize='unicode61 remove_diacritics 2')")
+    conn.execute("CREATE TRIGGER task_fts_insert AFTER INSERT ON task BEGIN "
+                 "INSERT INTO task_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END")
+    conn.execute("CREATE TRIGGER task_fts_delete AFTER DELETE ON task BEGIN "
+                 "INSERT INTO task_fts(task_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END")
+    conn.execute("CREATE TRIGGER task_fts_update AFTER UPDATE OF title, body ON task BEGIN "
+                 "INSERT INTO task_fts(task_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+                 "INSERT INTO task_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END")
+    conn.execute("INSERT INTO task_fts(task_fts) VALUES ('rebuild')")
+
+
+@migration
+def longer_password_hashes(conn: sqlite3.Connection):
+    """
+    Makes room for the salted hashes of the current password hashing scheme.
+    """
+    if columns(conn, "user")["password_hash"] != "VARCHAR(128)":
+        rebuild_table(conn, "user", user_table)
+
+
+@migration
+def unique_board_versions(conn: sqlite3.Connection):
+    """
+    Never reuses board ids and takes board versions from a counter, see boards.next_board_version.
+    """
+    if "AUTOINCREMENT" not in table_sql(conn, "board"):
+        rebuild_table(conn, "board", """CREATE TABLE "board" (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            title VARCHAR(20) NOT NULL,
+            version INTEGER NOT NULL,
+            changes_floor INTEGER NOT NULL
+        )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS counter (
+        name VARCHAR(40) NOT NULL,
+        value INTEGER NOT NULL,
+        PRIMARY KEY (name)
+    )""")
+    # Versions so far were max(version) + 1, the counter goes on from there
+    conn.execute("INSERT OR IGNORE INTO counter (name, value) SELECT 'board_version', coalesce(max(version), 0) "
+                 "FROM board")
+
+
+
+@migration
+def unique_logins(conn: sqlite3.Connection):
+    """
+    Makes the login index unique, so concurrent registrations can't create the same user twice.
+    """
+    duplicates = conn.execute('SELECT login FROM "user" GROUP BY login HAVING count(*) > 1').fetchall()
+    if duplicates:
+        raise RuntimeError(f"Logins registered more than once, remove the extra users first: "
+                           f"{[login for (login,) in duplicates[:10]]}")
+    conn.execute("DROP INDEX IF EXISTS ix_user_login")
+    conn.execute('CREATE UNIQUE INDEX ix_user_login ON "user" (login)')
+
+
+latest_version = len(migrations)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """
+    Returns the newest applied version, 0 for a database without the schema_version table.
+    """
+    if not table_sql(conn, "schema_version"):
+        return 0
+    return conn.execute("SELECT coalesce(max(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(db_path: str, target: int = latest_version) -> list[int]:
+    """
+    Applies the pending migrations up to the target version and returns the applied versions.
+
+    The version is read again in the write transaction of each migration, so migrations started
+    at the same time, e.g. by several containers, wait for each other and apply each one once.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        conn.execute("PRAGMA busy_timeout = 30000")
+        # Off for rebuild_table, foreign_key_check verifies the result of each migration instead
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("CREATE TABLE IF NOT EXISTS schema_version ("
+                     "version INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL, applied_at INTEGER NOT NULL)")
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = current_version(conn) + 1
+                if version > target:
+                    conn.execute("COMMIT")
+                    return applied
+                migrations[version - 1](conn)
+                violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if violations:
+                    raise RuntimeError(f"Migration {version} leaves rows with missing parents: {violations[:10]}")
+                conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                             (version, migrations[version - 1].__name__, int(time.time())))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version)
+    finally:
+        conn.close()
+
+
+def main():
+    from app.db import slqite_db_name
+
+    parser = argparse.ArgumentParser(description="Migrates the database schema to the latest version.")
+    parser.add_argument("--db", default=slqite_db_name, help="SQLite database file")
+    parser.add_argument("--check", action="store_true", help="only report the version, exit with 1 if behind")
+    args = parser.parse_args()
+
+    if args.check:
+        conn = sqlite3.connect(args.db)
+        version = current_version(conn)
+        conn.close()
+        print(f"{args.db}: schema version {version}, latest {latest_version}")
+        sys.exit(0 if version >= latest_version else 1)
+
+    for version in migrate(args.db):
+        print(f"Applied {version} {migrations[version - 1].__name__}")
+    print(f"{args.db}: schema version {latest_version}")
+
+
+if __name__ == "__main__":
+    main()
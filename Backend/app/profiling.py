@@ -0,0 +1,144 @@
+import cProfile
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# The middleware is only installed with JOBAN_PROFILING=1, otherwise requests don't pass through it at all
+profiling_enabled = os.environ.get("JOBAN_PROFILING", "0") == "1"
+# If set, the X-Profile header has to carry "<mode>:<key>" instead of just the mode
+profiling_key = os.environ.get("JOBAN_PROFILING_KEY", "")
+profiling_dir = os.environ.get("JOBAN_PROFILING_DIR", str(Path(tempfile.gettempdir()) / "joban-profiles"))
+profiling_interval = float(os.environ.get("JOBAN_PROFILING_INTERVAL_MS", "1")) / 1000
+
+# Only one deterministic profiler can run in the interpreter: from Python 3.12 on a second
+# enable() fails, before that it silently takes over from the first one
+cprofile_lock = threading.Lock()
+
+# (module, function) of leaf frames of threads blocked waiting for work, e.g. an aiosqlite
+# connection thread blocked in its queue. They would only bury the busy stacks.
+idle_frames = {("threading", "wait"), ("selectors", "select"), ("queue", "get"),
+               ("concurrent.futures.thread", "_worker"), ("aiosqlite.core", "run")}
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads at a fixed interval and folds them.
+
+    Handlers await between the event loop thread and the aiosqlite connection threads,
+    so both are sampled: time spent in SQLite shows up under the connection thread.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            if (frame.f_globals.get("__name__"), frame.f_code.co_name) in idle_frames:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            self.samples[";".join([names.get(ident, str(ident))] + stack[::-1])] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """
+        Returns the samples in the folded stack format of flamegraph.pl and speedscope.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests carrying an X-Profile header and stores the report.
+
+    "X-Profile: sample" samples stacks into a .folded flame graph file, "X-Profile: cprofile"
+    runs the deterministic profiler and dumps .prof stats for pstats or snakeviz. Both cover
+    everything in the process during the request, other requests included. The file name
+    is returned in the X-Profile-Report header. cprofile runs for one request at a time,
+    overlapping ones are served unprofiled with an "X-Profile-Skipped: busy" header.
+    """
+
+    def __init__(self, app, directory: str = profiling_dir, key: str = profiling_key,
+                 interval: float = profiling_interval):
+        self.app = app
+        self.directory = Path(directory)
+        self.key = key
+        self.interval = interval
+
+    def requested_mode(self, scope) -> str | None:
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                mode, _, key = value.decode().partition(":")
+                if mode in ("sample", "cprofile") and key == self.key:
+                    return mode
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self.requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            return await self.app(scope, receive, send)
+
+        if mode == "cprofile" and not cprofile_lock.acquire(blocking=False):
+            async def send_skipped(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-skipped", b"busy")]
+                await send(message)
+            return await self.app(scope, receive, send_skipped)
+
+        path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")
+        report = self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}-" \
+                                  f"{scope['method']}-{path}.{'folded' if mode == 'sample' else 'prof'}"
+
+        async def send_reported(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-report", report.name.encode())]
+            await send(message)
+
+        try:
+            profiler = StackSampler(self.interval) if mode == "sample" else cProfile.Profile()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if mode == "sample":
+                profiler.start()
+            else:
+                profiler.enable()
+            try:
+                await self.app(scope, receive, send_reported)
+            finally:
+                if mode == "sample":
+                    profiler.stop()
+                    report.write_text(profiler.folded())
+                else:
+                    profiler.disable()
+                    profiler.dump_stats(report)
+        finally:
+            if mode == "cprofile":
+                cprofile_lock.release()
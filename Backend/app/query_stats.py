@@ -0,0 +1,85 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+slow_query_ms = float(os.environ.get("JOBAN_SLOW_QUERY_MS", "100"))
+# Adds "Server-Timing: db;dur=<ms>;desc="<n> queries"" to responses, visible in browser dev tools
+server_timing = os.environ.get("JOBAN_SERVER_TIMING", "0") == "1"
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def header(self) -> str:
+        return f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries"'
+
+
+# Statements of the request being handled. SQLAlchemy runs the sync engine events in a greenlet
+# sharing the context of the awaiting task, so the hooks see the request's stats object.
+request_stats: ContextVar[QueryStats | None] = ContextVar("request_stats", default=None)
+total_stats = QueryStats()
+
+
+def instrument_engine(sync_engine):
+    """
+    Registers hooks on the engine which count statements and DB time per request and in total,
+    and log statements slower than JOBAN_SLOW_QUERY_MS.
+    """
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        for stats in (request_stats.get(), total_stats):
+            if stats is not None:
+                stats.count += 1
+                stats.seconds += seconds
+        if seconds * 1000 >= slow_query_ms:
+            # Parameters are left out, they may hold tokens or password hashes
+            logger.warning("Slow query took %.1f ms: %s", seconds * 1000, statement)
+
+
+def query_totals() -> dict:
+    """
+    Returns the statement count and DB time since start, exported on /metrics.
+    """
+    return {"queries": total_stats.count, "seconds": total_stats.seconds}
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware collecting the statements of each HTTP request into request_stats.
+
+    If server_timing is on, the count and the DB time up to the start of the response
+    are sent in the Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = request_stats.set(stats)
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start" and server_timing:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", stats.header().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            request_stats.reset(token)
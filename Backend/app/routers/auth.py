@@ -1,17 +1,28 @@
 from typing import Annotated
 from app.routers.auth_db import User, TokenStore
-from app.db import SessionDep
+from app.db import AsyncSessionDep, LockRetryRoute, async_engine, expect_write, write_lock_released
 
-from sqlmodel import select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, update, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import APIRouter, HTTPException, Depends, Response, Cookie
 from pydantic import Field
 from datetime import datetime, timedelta
 from app.routers.auth_utils import gen_salt
+from app.routers.auth_cache import token_cache
+from app.routers.auth_passwords import password_hasher
 from app.dependencies import RestRequestModel
-import hashlib
+import asyncio
+import logging
 import os
+import time
 
-router = APIRouter(prefix="/auth")
+router = APIRouter(prefix="/auth", route_class=LockRetryRoute)
+logger = logging.getLogger(__name__)
+
+token_lifetime = 3600
+token_purge_interval = float(os.environ.get("JOBAN_TOKEN_PURGE_INTERVAL", "300"))
+token_purge_batch = int(os.environ.get("JOBAN_TOKEN_PURGE_BATCH", "1000"))
 
 
 class Cookies(RestRequestModel):
@@ -19,26 +30,114 @@ class Cookies(RestRequestModel):
         validation_alias="DxpAccessToken", default=None)
 
 
-async def check_token(cookies: Annotated[Cookies, Cookie()], session: SessionDep):
+async def validate_token_record(token_record: TokenStore, session: AsyncSessionDep):
+    """
+    Checks the expiration of a token record and remembers it in the token cache.
+
+    Raises:
+        HTTPException: If the token is expired, with status code 401. The expired record is deleted.
+    """
+    if time.time() >= token_record.exp_time:
+        token_cache.invalidate(token_record.token)
+        await session.delete(token_record)
+        await session.commit()
+        raise HTTPException(status_code=401, detail="Token expired")
+    token_cache.put(token_record.token, token_record.login, token_record.exp_time)
+
+
+async def purge_expired_tokens(session: AsyncSession, batch_size: int = token_purge_batch) -> int:
+    """
+    Deletes expired tokens in batches, committing after each batch so the write lock is held briefly.
+
+    Expired tokens never hit the token cache, so it doesn't need to be invalidated here.
+
+    Returns:
+        int: The number of deleted tokens.
+    """
+    deleted = 0
+    while True:
+        expect_write()
+        expired = select(TokenStore.id).where(
+            TokenStore.exp_time <= int(time.time())).limit(batch_size)
+        result = await session.exec(delete(TokenStore).where(TokenStore.id.in_(expired)))
+        await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+async def sweep_expired_tokens(interval: float = token_purge_interval):
+    """
+    Periodically purges expired tokens. Started as a background task from the app lifespan.
+    """
+    while True:
+        try:
+            async with AsyncSession(async_engine) as session:
+                await purge_expired_tokens(session)
+        except Exception:
+            logger.exception("Expired token purge failed")
+        await asyncio.sleep(interval)
+
+
+async def check_token(cookies: Annotated[Cookies, Cookie()], session: AsyncSessionDep):
     """
     Validates the provided token from cookies and checks its expiration.
 
+    Tokens which were validated recently are served from the in-process token cache
+    without querying the database.
+
     Args:
         cookies (Annotated[Cookies, Cookie()]): Cookies object containing the token to validate.
-        session (SessionDep): Database session dependency for querying and updating the token store.
+        session (AsyncSessionDep): Database session dependency for querying and updating the token store.
 
     Raises:
         HTTPException: If the token is expired or not found, with status code 401.
     """
-    token_record = session.exec(select(TokenStore).where(
-        TokenStore.token == cookies.id_token)).first()
-    if token_record:
-        if datetime.now() >= datetime.fromisoformat(token_record.exp_time):
-            session.delete(token_record)
-            session.commit()
-            raise HTTPException(status_code=401, detail="Token expired")
+    if cookies.id_token and token_cache.get(cookies.id_token):
+        return
+
+    token_record = (await session.exec(select(TokenStore).where(
+        TokenStore.token == cookies.id_token))).first()
+    if not token_record:
+        raise HTTPException(status_code=401, detail="Not authorized")
+    await validate_token_record(token_record, session)
+
+
+async def get_current_user(cookies: Annotated[Cookies, Cookie()], session: AsyncSessionDep) -> User:
+    """
+    Resolves the user owning the token from cookies.
+
+    A warm token costs a single lookup of the user by login, a cold one a single
+    query joining the token store with the users. FastAPI caches the result for
+    the rest of the request, so any number of dependants share it.
+
+    Args:
+        cookies (Annotated[Cookies, Cookie()]): Cookies object containing the token to validate.
+        session (AsyncSessionDep): Database session dependency for querying the user and the token store.
+
+    Returns:
+        User: The authenticated user.
+
+    Raises:
+        HTTPException: If the token is expired or not found, with status code 401.
+    """
+    cached = token_cache.get(cookies.id_token) if cookies.id_token else None
+    if cached:
+        db_user = (await session.exec(select(User).where(
+            User.login == cached[0]))).first()
     else:
+        row = (await session.exec(select(User, TokenStore).join(
+            TokenStore, TokenStore.login == User.login).where(
+            TokenStore.token == cookies.id_token))).first()
+        db_user, token_record = row if row else (None, None)
+        if token_record:
+            await validate_token_record(token_record, session)
+    if not db_user:
         raise HTTPException(status_code=401, detail="Not authorized")
+    return db_user
+
+
+CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
 @router.get("/protected", dependencies=[Depends(check_token)])
@@ -46,35 +145,30 @@ async def prot():
     return "authorized"
 
 
+@router.get("/cache", dependencies=[Depends(check_token)])
+async def cache_stats():
+    """
+    Returns the token cache counters: current size, capacity, hits and misses.
+    """
+    return token_cache.stats()
+
+
 class DisplayName(RestRequestModel):
     display_name: str
 
 
-@router.get("/whoami", dependencies=[Depends(check_token)])
-async def whoami(session: SessionDep, cookies: Annotated[Cookies, Cookie()]) -> DisplayName:
+@router.get("/whoami")
+async def whoami(user: CurrentUser) -> DisplayName:
     """
     Retrieves the display name of the authenticated user.
 
     Args:
-        session (SessionDep): Database session dependency for querying user information.
-        cookies (Annotated[Cookies, Cookie()]): Cookies object containing the token for user authentication.
+        user (CurrentUser): The authenticated user resolved from the token in cookies.
 
     Returns:
         dict: A dictionary with the key "display_name" containing the user's full name.
     """
-    if not cookies.id_token:
-        raise HTTPException(status_code=401, detail="Token not provided")
-
-    token_record = session.exec(select(TokenStore).where(
-        TokenStore.token == cookies.id_token)).first()
-
-    if not token_record:
-        raise HTTPException(
-            status_code=401, detail="Token is invalid or expired")
-
-    db_user = session.exec(select(User).where(
-        User.login == token_record.login)).first()
-    return {"display_name": db_user.first_name + " " + db_user.last_name}
+    return {"display_name": user.first_name + " " + user.last_name}
 
 
 class UserRegisterRequest(RestRequestModel):
@@ -91,13 +185,13 @@ register_responses = {
 
 
 @router.post("/register", status_code=201, responses=register_responses)
-async def register(user: UserRegisterRequest, session: SessionDep) -> User:
+async def register(user: UserRegisterRequest, session: AsyncSessionDep) -> User:
     """
     Registers a new user in the system.
 
     Args:
         user (UserRegisterRequest): User registration request containing login, password, and user details.
-        session (SessionDep): Database session dependency for storing the new user.
+        session (AsyncSessionDep): Database session dependency for storing the new user.
 
     Returns:
         User: The newly registered user object.
@@ -108,26 +202,33 @@ async def register(user: UserRegisterRequest, session: SessionDep) -> User:
     if not user.login.isalnum() or not user.password.isalnum():
         raise HTTPException(detail="Username or password is not alphanumeric", status_code=400)
 
-    check_user = session.exec(select(User).where(
-        User.login == user.login)).first()
+    salt = gen_salt(16)
+    # Hashed before the first transaction and without the write lock, so the check and the
+    # insert below run in one write transaction without holding up the other writes
+    async with write_lock_released():
+        password_hash = await password_hasher.hash(user.password, salt)
+
+    check_user = (await session.exec(select(User).where(
+        User.login == user.login))).first()
     if check_user:
         raise HTTPException(detail="User already exists", status_code=409)
 
-    salt = gen_salt(16)
-    hasher = hashlib.sha256()
-    hasher.update((user.password + salt).encode())
-
     db_user = User(
         login=user.login,
         first_name=user.first_name,
         last_name=user.last_name,
         salt=salt,
-        password_hash=hasher.hexdigest()
+        password_hash=password_hash
     )
 
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Registered by another worker since the check, the unique index on the login caught it
+        await session.rollback()
+        raise HTTPException(detail="User already exists", status_code=409)
+    await session.refresh(db_user)
     return db_user
 
 
@@ -144,17 +245,19 @@ login_responses = {
 
 
 @router.post("/login", status_code=200, responses=login_responses)
-async def login(user: UserLoginRequest, session: SessionDep, response: Response) -> DisplayName:
+async def login(user: UserLoginRequest, session: AsyncSessionDep, response: Response) -> DisplayName:
     """
     Authenticates a user and generates an access token.
 
     This function verifies the user's credentials by comparing the provided password, salted and hashed, with the stored hash.
+    Hashing runs on the password hasher thread pool. A hash made with a legacy or outdated scheme is replaced by
+    a current one in the same commit as the token.
     If valid, it generates a unique access token, stores it in the database with an expiration time, and sets it as a cookie
     in the response.
 
     Args:
         user (UserLoginRequest): Login request containing the user's login and password.
-        session (SessionDep): Database session dependency for user authentication and token storage.
+        session (AsyncSessionDep): Database session dependency for user authentication and token storage.
         response (Response): Response object to set the authentication token as a cookie.
 
     Returns:
@@ -168,23 +271,28 @@ async def login(user: UserLoginRequest, session: SessionDep, response: Response)
     if not user.login.isalnum() or not user.password.isalnum():
         raise HTTPException(detail="Username or password is not alphanumeric", status_code=400)
 
-    db_user = session.exec(select(User).where(
-        User.login == user.login)).first()
+    db_user = (await session.exec(select(User).where(
+        User.login == user.login))).first()
     if not db_user:
         raise HTTPException(detail="User not found", status_code=404)
 
-    hasher = hashlib.sha256()
-    hasher.update((user.password + db_user.salt).encode())
-    if hasher.hexdigest() != db_user.password_hash:
+    # Hashing may wait for the pool, don't hold a database connection meanwhile
+    session.expunge(db_user)
+    await session.rollback()
+    if not await password_hasher.verify(user.password, db_user.salt, db_user.password_hash):
         raise HTTPException(detail="Wrong password", status_code=401)
+    if password_hasher.needs_rehash(db_user.password_hash):
+        # Legacy SHA-256 and outdated scrypt hashes are upgraded while the password is at hand
+        await session.exec(update(User).where(User.id == db_user.id).values(
+            password_hash=await password_hasher.hash(user.password, db_user.salt)))
 
     token = os.urandom(32).hex()
     session.add(TokenStore(
         login=user.login,
         token=token,
-        exp_time=(datetime.now() + timedelta(hours=1)).isoformat()
+        exp_time=int(time.time()) + token_lifetime
     ))
-    session.commit()
+    await session.commit()
 
     response.set_cookie(
         key="DxpAccessToken",
@@ -192,19 +300,20 @@ async def login(user: UserLoginRequest, session: SessionDep, response: Response)
         httponly=True,
         secure=True,
         samesite="None",
-        max_age=3600,
-        expires=(datetime.now() + timedelta(hours=1)).isoformat(),
+        max_age=token_lifetime,
+        expires=(datetime.now() + timedelta(seconds=token_lifetime)).isoformat(),
     )
     return {"display_name": db_user.first_name + " " + db_user.last_name}
 
 
 @router.post("/logout", status_code=200, dependencies=[Depends(check_token)])
-async def logout(cookies: Annotated[Cookies, Cookie()], response: Response, session: SessionDep):
-    token_record = session.exec(select(TokenStore).where(
-        TokenStore.token == cookies.id_token)).first()
+async def logout(cookies: Annotated[Cookies, Cookie()], response: Response, session: AsyncSessionDep):
+    token_cache.invalidate(cookies.id_token)
+    token_record = (await session.exec(select(TokenStore).where(
+        TokenStore.token == cookies.id_token))).first()
     if token_record:
-        session.delete(token_record)
-        session.commit()
+        await session.delete(token_record)
+        await session.commit()
 
     response.set_cookie(
         key="DxpAccessToken",
@@ -0,0 +1,61 @@
+import os
+import time
+from collections import OrderedDict
+
+token_cache_size = int(os.environ.get("JOBAN_TOKEN_CACHE_SIZE", "10000"))
+token_cache_ttl = float(os.environ.get("JOBAN_TOKEN_CACHE_TTL", "60"))
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of validated tokens with a time to live.
+
+    Maps a token to the login it belongs to and its expiration time, so a warm
+    token is validated without touching the database.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[str, int, float]] = OrderedDict()
+
+    def get(self, token: str) -> tuple[str, int] | None:
+        """
+        Returns (login, exp_time) for a cached token which is still valid.
+
+        Entries that outlived the cache ttl or the token itself are dropped.
+        """
+        entry = self._entries.get(token)
+        if entry and entry[2] > time.monotonic() and entry[1] > time.time():
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0], entry[1]
+        if entry:
+            del self._entries[token]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, login: str, exp_time: int):
+        self._entries[token] = (login, exp_time, time.monotonic() + self.ttl)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+token_cache = TokenCache(token_cache_size, token_cache_ttl)
@@ -5,8 +5,9 @@ class User(SQLModel, table=True):
     id: int = Field(primary_key=True)
     first_name: str = Field(max_length=20)
     last_name: str = Field(max_length=30)
-    login: str = Field(max_length=20, index=True)
-    password_hash: str = Field(max_length=64)
+    login: str = Field(max_length=20, index=True, unique=True)
+    # "scrypt$n$r$p$hex", or a bare SHA-256 hex digest for passwords not upgraded yet
+    password_hash: str = Field(max_length=128)
     salt: str = Field(max_length=16)
 
 
@@ -14,4 +15,5 @@ class TokenStore(SQLModel, table=True):
     id: int = Field(primary_key=True)
     login: str = Field(max_length=20)
     token: str = Field(index=True)
-    exp_time: str = Field()
+    # Expiration time as a unix timestamp in seconds
+    exp_time: int = Field(index=True)
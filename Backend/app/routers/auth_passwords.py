@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+password_hash_workers = int(os.environ.get("JOBAN_PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+scrypt_n = int(os.environ.get("JOBAN_SCRYPT_N", "16384"))
+scrypt_r = int(os.environ.get("JOBAN_SCRYPT_R", "8"))
+scrypt_p = int(os.environ.get("JOBAN_SCRYPT_P", "1"))
+
+
+password_hash_niceness = int(os.environ.get("JOBAN_PASSWORD_HASH_NICENESS", "10"))
+
+
+def lower_thread_priority():
+    # On Linux the niceness applies to the calling thread only: when cores are scarce the
+    # scheduler prefers the event loop over hashing
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), password_hash_niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+class PasswordHasher:
+    """
+    Hashes passwords with scrypt on a bounded thread pool, off the event loop.
+
+    hashlib.scrypt releases the GIL, so hashing neither blocks other requests nor takes
+    more than `workers` cores: a burst of logins queues up in the pool. Hashes are stored
+    as "scrypt$n$r$p$hex", so the cost can be raised later and old hashes still verify.
+    Bare hex digests are the salted SHA-256 hashes from before scrypt, they still verify.
+    """
+
+    def __init__(self, workers: int, n: int, r: int, p: int):
+        self.workers = workers
+        self.n = n
+        self.r = r
+        self.p = p
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash",
+                                            initializer=lower_thread_priority)
+
+    def _scrypt(self, password: str, salt: str, n: int, r: int, p: int) -> str:
+        digest = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+                                maxmem=256 * n * r * p, dklen=32)
+        return f"scrypt${n}${r}${p}${digest.hex()}"
+
+    def _verify(self, password: str, salt: str, password_hash: str) -> bool:
+        if not password_hash.startswith("scrypt$"):
+            legacy = hashlib.sha256((password + salt).encode()).hexdigest()
+            return hmac.compare_digest(legacy, password_hash)
+        _, n, r, p, _ = password_hash.split("$")
+        return hmac.compare_digest(self._scrypt(password, salt, int(n), int(r), int(p)), password_hash)
+
+    async def hash(self, password: str, salt: str) -> str:
+        """
+        Hashes a password with the current cost parameters.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._scrypt, password, salt, self.n, self.r, self.p)
+
+    async def verify(self, password: str, salt: str, password_hash: str) -> bool:
+        """
+        Checks a password against a stored scrypt or legacy SHA-256 hash in constant time.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._verify, password, salt, password_hash)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        Tells whether a stored hash is legacy SHA-256 or uses other cost parameters than the current ones.
+        """
+        return not password_hash.startswith(f"scrypt${self.n}${self.r}${self.p}$")
+
+
+password_hasher = PasswordHasher(password_hash_workers, scrypt_n, scrypt_r, scrypt_p)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from pydantic_core import to_json
+from sqlalchemy import func
+from sqlmodel import select, insert, update, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import async_engine, expect_write
+from app.routers.board_events import board_broadcaster, events_poll_interval
+from app.routers.boards_db import Board, BoardChange
+
+logger = logging.getLogger(__name__)
+
+change_log_retention = int(os.environ.get("JOBAN_CHANGE_LOG_RETENTION", "86400"))
+change_log_purge_interval = float(os.environ.get("JOBAN_CHANGE_LOG_PURGE_INTERVAL", "3600"))
+change_log_purge_batch = int(os.environ.get("JOBAN_CHANGE_LOG_PURGE_BATCH", "1000"))
+
+
+async def log_changes(board_ids: list[int], changes: list[tuple[str, dict]], session: AsyncSession) -> list[int]:
+    """
+    Appends operations to the change log of each board with a single executemany insert.
+
+    Args:
+        board_ids (list[int]): The boards the operations belong to.
+        changes (list[tuple[str, dict]]): Pairs of operation name and payload.
+        session (AsyncSession): The session of the write, so the log is committed with it.
+
+    Returns:
+        list[int]: The sequence numbers of the logged operations, board by board in the order of changes.
+    """
+    now = int(time.time())
+    rows = [{"board_id": board_id, "op": op, "data": to_json(data).decode(), "created_at": now}
+            for board_id in board_ids for op, data in changes]
+    if not rows:
+        return []
+    # Rows get ascending ids in parameter order: the batches run one after another and
+    # SQLite assigns ids row by row. Sorting is cheaper than sort_by_parameter_order,
+    # which would fall back to one INSERT per row here.
+    return sorted((await session.exec(insert(BoardChange).returning(BoardChange.id),
+                                      params=rows)).scalars().all())
+
+
+async def compact_change_log(session: AsyncSession, max_age: int = change_log_retention,
+                             batch_size: int = change_log_purge_batch) -> int:
+    """
+    Deletes changes older than max_age seconds in batches, raising the changes_floor of their boards.
+
+    Returns:
+        int: The number of deleted changes.
+    """
+    deleted = 0
+    while True:
+        # Every worker process compacts, each batch reads before it writes
+        expect_write()
+        doomed = select(BoardChange.id).where(
+            BoardChange.created_at < int(time.time()) - max_age).order_by(BoardChange.id).limit(batch_size)
+        floors = (await session.exec(select(BoardChange.board_id, func.max(BoardChange.id)).where(
+            BoardChange.id.in_(doomed)).group_by(BoardChange.board_id))).all()
+        if floors:
+            await session.exec(update(Board), params=[
+                {"id": board_id, "changes_floor": floor} for board_id, floor in floors])
+        result = await session.exec(delete(BoardChange).where(BoardChange.id.in_(doomed)))
+        await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+async def sweep_change_log(interval: float = change_log_purge_interval):
+    """
+    Periodically compacts the change log. Started as a background task from the app lifespan.
+    """
+    while True:
+        try:
+            async with AsyncSession(async_engine) as session:
+                await compact_change_log(session)
+        except Exception:
+            logger.exception("Change log compaction failed")
+        await asyncio.sleep(interval)
+
+
+async def publish_logged_changes(session: AsyncSession, after: int | None) -> int:
+    """
+    Publishes the changes logged after a sequence number to the subscribers of their boards.
+
+    SQLite has a single writer, so changes commit in sequence order and nothing below the
+    highest visible sequence number can show up later. The events carry the version the
+    board has when they are read, and the changes of a board read in one poll are published
+    together, like the events of one commit. A deleted board takes its change log with it, so the
+    subscribed boards which no longer exist get a board.delete event without a version.
+
+    Args:
+        session (AsyncSession): Session to read the change log with.
+        after (int | None): The last sequence number published, None to only look up where the log ends.
+
+    Returns:
+        int: The highest sequence number in the log, to pass as after next time.
+    """
+    last = (await session.exec(select(func.max(BoardChange.id)))).one() or 0
+    board_ids = board_broadcaster.board_ids()
+    if after is None or not board_ids:
+        return last
+    if last > after:
+        rows = (await session.exec(
+            select(BoardChange.id, BoardChange.board_id, BoardChange.op, BoardChange.data, Board.version)
+            .join(Board, Board.id == BoardChange.board_id)
+            .where(BoardChange.id > after, BoardChange.id <= last, BoardChange.board_id.in_(board_ids))
+            .order_by(BoardChange.id))).all()
+        by_board = {}
+        for seq, board_id, op, data, version in rows:
+            by_board.setdefault(board_id, []).append({"seq": seq, "boardId": board_id, "version": version,
+                                                      "op": op, "data": json.loads(data)})
+        for board_id, payloads in by_board.items():
+            board_broadcaster.publish(board_id, payloads)
+    existing = set((await session.exec(select(Board.id).where(Board.id.in_(board_ids)))).all())
+    for board_id in set(board_ids) - existing:
+        board_broadcaster.publish(board_id, [{"seq": last, "boardId": board_id, "version": None,
+                                              "op": "board.delete", "data": {"id": board_id}}])
+        board_broadcaster.close(board_id)
+    return last
+
+
+async def tail_change_log(interval: float = events_poll_interval):
+    """
+    Publishes the board events of all worker processes from the change log. Started as a
+    background task from the app lifespan if JOBAN_EVENTS_POLL_INTERVAL is set.
+    """
+    after = None
+    while True:
+        try:
+            async with AsyncSession(async_engine) as session:
+                after = await publish_logged_changes(session, after)
+        except Exception:
+            logger.exception("Publishing board events from the change log failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,175 @@
+import asyncio
+import os
+from collections import deque
+
+from pydantic_core import to_json
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+events_max_pending = int(os.environ.get("JOBAN_EVENTS_MAX_PENDING", "256"))
+# A commit only reaches the subscribers in its own process. With several worker processes,
+# a positive interval makes every process publish the events it reads from the change log
+# instead, see board_changes.tail_change_log.
+events_poll_interval = float(os.environ.get("JOBAN_EVENTS_POLL_INTERVAL", "0"))
+
+
+class Subscription:
+    """
+    A single connection listening to the events of one board.
+
+    Messages wait in a bounded buffer until the connection sends them. The events of one
+    commit are pushed together and count once: a connection which falls max_pending commits
+    behind is marked as lagging and gets no more messages, however large each commit was.
+    It has to close and catch up through the change log instead of growing the buffer.
+    A subscription to a deleted board is closed after its last message.
+    """
+
+    def __init__(self, board_id: int, max_pending: int):
+        self.board_id = board_id
+        self.max_pending = max_pending
+        self.lagging = False
+        self.closed = False
+        self.loop = asyncio.get_running_loop()
+        # The messages of each commit not fully sent yet
+        self._pending: deque[deque[str]] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, messages: list[str]) -> bool:
+        if len(self._pending) >= self.max_pending:
+            self.lagging = True
+        elif not self.lagging and messages:
+            self._pending.append(deque(messages))
+        self._ready.set()
+        return not self.lagging
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next(self) -> str | None:
+        """
+        Waits for the next message.
+
+        Returns:
+            str | None: The message, or None once the buffered messages of a lagging or
+            closed subscription are used up.
+        """
+        while not self._pending:
+            if self.lagging or self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        commit = self._pending[0]
+        message = commit.popleft()
+        if not commit:
+            self._pending.popleft()
+        return message
+
+
+class BoardBroadcaster:
+    """
+    In-process fan-out of board events to the subscribed connections.
+
+    Each event is encoded once and the same string is handed to every subscriber of its board.
+    The events of one commit are published with one call, see Subscription.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self.published = 0
+        self.lagged = 0
+
+    def subscribe(self, board_id: int) -> Subscription:
+        subscription = Subscription(board_id, self.max_pending)
+        self._subscribers.setdefault(board_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.board_id)
+        if subscription.lagging:
+            self.lagged += 1
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.board_id]
+
+    def board_ids(self) -> list[int]:
+        return list(self._subscribers)
+
+    def publish(self, board_id: int, payloads: list):
+        """
+        Hands the events of one commit to the subscribers of the board, in order.
+        """
+        subscribers = self._subscribers.get(board_id)
+        if not subscribers or not payloads:
+            return
+        messages = [to_json(payload).decode() for payload in payloads]
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for subscription in subscribers:
+            if subscription.lagging:
+                continue
+            if subscription.loop is loop:
+                subscription.push(messages)
+            else:
+                # Connections served by another event loop get the messages on their own thread
+                subscription.loop.call_soon_threadsafe(subscription.push, messages)
+        self.published += len(messages)
+
+    def close(self, board_id: int):
+        """
+        Closes the subscriptions of a deleted board once they sent the messages published so far.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for subscription in self._subscribers.pop(board_id, ()):
+            if subscription.loop is loop:
+                subscription.close()
+            else:
+                subscription.loop.call_soon_threadsafe(subscription.close)
+
+    def stats(self) -> dict:
+        return {
+            "boards": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "lagged": self.lagged,
+        }
+
+
+board_broadcaster = BoardBroadcaster(events_max_pending)
+
+
+def stage_events(session, events: list[tuple[int, dict]]):
+    """
+    Queues events on the session, they are published once its transaction commits.
+
+    Args:
+        session: The session (sync or async) of the write producing the events.
+        events (list[tuple[int, dict]]): Pairs of board id and event payload.
+    """
+    session.info.setdefault("board_events", []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def publish_staged_events(session: Session):
+    events = session.info.pop("board_events", [])
+    if events_poll_interval:
+        return
+    by_board = {}
+    for board_id, payload in events:
+        by_board.setdefault(board_id, []).append(payload)
+    for board_id, payloads in by_board.items():
+        board_broadcaster.publish(board_id, payloads)
+        if payloads[-1]["op"] == "board.delete":
+            board_broadcaster.close(board_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def drop_staged_events(session: Session):
+    session.info.pop("board_events", None)
@@ -1,13 +1,70 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import select
-from app.routers.boards_db import Board, Column, Task
-from app.db import SessionDep
-from typing import List, Annotated
+import asyncio
+from contextlib import suppress
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Header, Query, Response, WebSocket, \
+    WebSocketDisconnect
+from sqlmodel import select, insert, update, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, func, literal_column, select as select_columns
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
+from app.routers.boards_db import Board, BoardChange, Column, Counter, Task, task_fts
+from app.db import AsyncSessionDep, LockRetryRoute, expect_write
+from typing import List, Annotated, Literal, Union
 from app.dependencies import RestRequestModel
 from pydantic import Field
+from pydantic_core import from_json, to_json
 from app.routers.auth import check_token
+from app.routers.boards_utils import rank_between, rank_for_ordinal, rank_rebalance_length
+from app.routers.boards_cache import board_cache
+from app.routers.board_changes import log_changes
+from app.routers.board_events import Subscription, board_broadcaster, stage_events
+from app.routers.tasks_batch import TaskBatch
 
-board_router = APIRouter(prefix="/boards")
+board_router = APIRouter(prefix="/boards", route_class=LockRetryRoute)
+
+
+board_version_counter = "board_version"
+
+
+async def next_board_version(session: AsyncSession) -> int:
+    """
+    Takes the next value of the global board version counter.
+
+    The counter also moves on when boards are deleted, so its value versions the board list,
+    and a version is never given out twice, not even after the newest board was deleted.
+    """
+    return (await session.exec(sqlite_insert(Counter).values(name=board_version_counter, value=1)
+                               .on_conflict_do_update(index_elements=[Counter.name],
+                                                      set_={"value": Counter.value + 1})
+                               .returning(Counter.value))).scalar_one()
+
+
+def boards_of_columns(*column_ids: int):
+    return Board.id.in_(select_columns(Column.board_id).where(Column.id.in_(column_ids)))
+
+
+async def record_changes(boards, changes: list[tuple[str, dict]], session: AsyncSession):
+    """
+    Gives the boards matching the filter a new version, drops their cached responses,
+    appends the changes to their change log and stages them for the event stream of
+    the boards. Called by every board, column and task write.
+    """
+    bumped = (await session.exec(update(Board).where(boards).values(
+        version=await next_board_version(session)).returning(Board.id, Board.version))).all()
+    for board_id, _ in bumped:
+        board_cache.invalidate(board_id)
+    seqs = iter(await log_changes([board_id for board_id, _ in bumped], changes, session))
+    stage_events(session, [
+        (board_id, {"seq": next(seqs), "boardId": board_id, "version": version, "op": op, "data": data})
+        for board_id, version in bumped for op, data in changes])
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags or "*" in tags
 
 
 class ColumnCreateRequest(RestRequestModel):
@@ -20,60 +77,192 @@ class BoardCreateRequest(RestRequestModel):
     columns: List['ColumnCreateRequest']
 
 
+class BoardSummary(RestRequestModel):
+    id: int
+    title: str
+
+
+class BoardListItem(RestRequestModel):
+    id: int
+    title: str | None = None
+    version: int | None = None
+
+
+class TaskResponse(RestRequestModel):
+    title: str
+    description: str
+    column_id: int
+    order_number: int
+    id: int
+
+
+class ColumnResponse(RestRequestModel):
+    board_id: int
+    id: int
+    order_number: int
+    title: str
+    tasks: List[TaskResponse]
+
+
+class BoardResponse(RestRequestModel):
+    id: int
+    title: str
+    columns: List[ColumnResponse]
+
+
+class TaskRead(RestRequestModel):
+    id: int
+    col_id: int
+    ord_num: int
+    title: str
+    body: str
+
+
+def encode_board(board: Board, board_columns: list[Column]) -> bytes:
+    """
+    Encodes a board with its columns and tasks in the shape of BoardResponse.
+
+    The rows are already validated by the database, so plain dicts are handed to the
+    pydantic-core serializer in one pass instead of building a model per task. The response
+    bypasses response_model, test_board_response_shape keeps the output in line with it.
+    """
+    return to_json({
+        "id": board.id,
+        "title": board.title,
+        "columns": [{
+            "boardId": col.board_id,
+            "id": col.id,
+            "orderNumber": col.ord_num,
+            "title": col.title,
+            "tasks": [{
+                "title": t.title,
+                "description": t.body,
+                "columnId": t.col_id,
+                "orderNumber": t.ord_num,
+                "id": t.id
+            } for t in col.tasks]
+        } for col in board_columns],
+    })
+
+
 @board_router.post("/new", status_code=200, dependencies=[Depends(check_token)])
-async def create_board(board_req: BoardCreateRequest, session: SessionDep):
+async def create_board(board_req: BoardCreateRequest, session: AsyncSessionDep) -> BoardSummary:
     """
     Creates a new board with specified columns.
 
     Args:
         board_req (BoardCreateRequest): The request containing board details, including title and columns.
-        session (SessionDep): The database session dependency for performing operations.
+        session (AsyncSessionDep): The database session dependency for performing operations.
 
     Returns:
-        Board: The created board instance with refreshed data from the database.
+        BoardSummary: The ID and the title of the created board.
     """
     board = Board(title=board_req.title,
-                  columns=[Column(title=col.title, ord_num=col.order_number)
+                  columns=[Column(title=col.title, ord_num=col.order_number,
+                                  rank=rank_for_ordinal(col.order_number))
                            for col in board_req.columns]
                   )
     session.add(board)
-    session.commit()
-    session.refresh(board)
+    await session.flush()
+    await record_changes(Board.id == board.id, [("board.create", {
+        "title": board.title,
+        "columns": [{"id": col.id, "title": col.title, "orderNumber": col.ord_num}
+                    for col in board.columns],
+    })], session)
+    await session.commit()
+    await session.refresh(board)
     return board
 
 
-@board_router.get("", status_code=200, dependencies=[Depends(check_token)])
-async def get_boards_list(session: SessionDep) -> List[Board]:
+boards_page_limit = 500
+board_list_fields = ["id", "title"]
+
+
+def board_projection(fields: str | None) -> list:
+    names = fields.split(",") if fields else board_list_fields
+    # Only what BoardListItem returns, other columns would be read and then dropped
+    if not set(names) <= set(BoardListItem.model_fields):
+        raise HTTPException(status_code=422, detail="Unknown board field")
+    # id is always selected since the cursor is built from it
+    return [Board.id] + [getattr(Board, n) for n in names if n != "id"]
+
+
+@board_router.get("", status_code=200, dependencies=[Depends(check_token)],
+                  response_model_exclude_unset=True)
+async def get_boards_list(
+    session: AsyncSessionDep,
+    response: Response,
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=boards_page_limit)] = 100,
+    fields: str | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> List[BoardListItem]:
     """
-    Retrieves the list of all boards.
+    Retrieves a page of boards ordered by id using keyset pagination.
 
     Args:
-        session (SessionDep): The database session dependency for performing the query.
+        session (AsyncSessionDep): The database session dependency for performing the query.
+        response (Response): Response object to set the X-Next-Cursor header on.
+        after (int | None): Cursor, the id of the last board of the previous page.
+        limit (int): Maximum number of boards in the page, capped by boards_page_limit.
+        fields (str | None): Comma separated fields of BoardListItem to read, by default id and title.
+        if_none_match (str | None): ETag of the list the client already has.
 
     Returns:
-        List[Board]: A list of all board instances in the database.
+        List[BoardListItem]: The projected fields of the boards of the page. If more boards may follow, the X-Next-Cursor
+        header holds the value to pass as `after` for the next page. The ETag changes
+        whenever a board is created, changed or deleted; a matching If-None-Match gets 304.
     """
-    boards = session.exec(select(Board)).all()
+    list_version = (await session.exec(select(Counter.value).where(Counter.name == board_version_counter))).first()
+    etag = f'"{list_version or 0}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # Plain SQLAlchemy select keeps rows as tuples even for a single column
+    query = select_columns(*board_projection(fields)).order_by(Board.id).limit(limit)
+    if after is not None:
+        query = query.where(Board.id > after)
+    boards = [dict(row) for row in (await session.exec(query)).mappings()]
+    if len(boards) == limit:
+        response.headers["X-Next-Cursor"] = str(boards[-1]["id"])
     return boards
 
 
-async def query_board(board_id: int, session: SessionDep) -> Board:
-    board = session.get(Board, board_id)
+async def query_board(board_id: int, session: AsyncSessionDep) -> Board:
+    board = await session.get(Board, board_id)
     if not board:
         raise HTTPException(detail="Board not found", status_code=404)
     return board
 
 
-@board_router.get("/{board_id}", status_code=200, dependencies=[Depends(check_token)])
-async def get_board(board: Annotated[Board, Depends(query_board)]):
+@board_router.get("/cache", status_code=200, dependencies=[Depends(check_token)])
+async def board_cache_stats():
+    """
+    Returns the board response cache counters: entries, memory use, budget, hits, misses and hit ratio.
+    """
+    return board_cache.stats()
+
+
+@board_router.get("/{board_id}", status_code=200, dependencies=[Depends(check_token)],
+                  response_model=BoardResponse)
+async def get_board(board: Annotated[Board, Depends(query_board)], session: AsyncSessionDep,
+                    if_none_match: Annotated[str | None, Header()] = None):
     """
     Retrieves the details of a specific board, including its columns and tasks.
 
+    The board version is sent as ETag. If it matches If-None-Match, 304 is returned
+    without loading columns and tasks. Otherwise the encoded body is served from the
+    board response cache, or the columns and tasks are loaded with two more queries
+    regardless of board size and the encoded body is cached for this version.
+
     Args:
         board (Board): The board instance fetched via the query_board dependency.
+        session (AsyncSessionDep): The database session dependency for performing the query.
+        if_none_match (str | None): ETag of the board version the client already has.
 
     Returns:
-        dict: A dictionary representation of the board, including:
+        BoardResponse: The encoded board, including:
             - id (int): The ID of the board.
             - title (str): The title of the board.
             - columns (list): A list of column details, where each column includes:
@@ -88,31 +277,135 @@ async def get_board(board: Annotated[Board, Depends(query_board)]):
                     - orderNumber (int): The order number of the task.
                     - id (int): The ID of the task.
     """
-    columns = [{
-        "boardId": col.board_id,
-        "id": col.id,
-        "orderNumber": col.ord_num,
-        "title": col.title,
-        "tasks": [{
-            "title": t.title,
-            "description": t.body,
-            "columnId": t.col_id,
-            "orderNumber": t.ord_num,
-            "id": t.id
-        } for t in col.tasks]
-    } for col in board.columns]
-
-    return {
-        "id": board.id,
-        "title": board.title,
-        "columns": columns,
-    }
+    etag = f'"{board.version}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    cached = board_cache.get(board.id, board.version)
+    if cached:
+        return Response(content=cached, media_type="application/json", headers={"ETag": etag})
+
+    board_columns = (await session.exec(select(Column).where(
+        Column.board_id == board.id).order_by(Column.rank, Column.ord_num, Column.id).options(
+        selectinload(Column.tasks)))).all()
+    body = encode_board(board, board_columns)
+    board_cache.put(board.id, board.version, body)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+changes_page_limit = 1000
+
+
+class BoardChangeItem(RestRequestModel):
+    seq: int
+    op: str
+    data: dict
+
+
+class BoardChanges(RestRequestModel):
+    resync: bool
+    version: int
+    last_seq: int
+    has_more: bool
+    changes: List[BoardChangeItem]
+
+
+@board_router.get("/{board_id}/changes", status_code=200, dependencies=[Depends(check_token)])
+async def get_board_changes(
+    board: Annotated[Board, Depends(query_board)],
+    session: AsyncSessionDep,
+    since: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=changes_page_limit)] = changes_page_limit,
+) -> BoardChanges:
+    """
+    Retrieves the operations applied to a board after the given change log sequence number.
+
+    Args:
+        board (Board): The board instance fetched via the query_board dependency.
+        session (AsyncSessionDep): The database session dependency for performing the query.
+        since (int): The last sequence number the client has applied, 0 for none.
+        limit (int): Maximum number of operations to return, capped by changes_page_limit.
+
+    Returns:
+        BoardChanges: The operations after `since` in order, the sequence number to pass
+        as `since` next time and whether more operations follow. If the log was compacted
+        past `since`, `resync` is set: the client has to fetch the whole board and then
+        sync from `last_seq`.
+    """
+    if since < board.changes_floor:
+        last_seq = (await session.exec(select(func.max(BoardChange.id)).where(
+            BoardChange.board_id == board.id))).first()
+        return BoardChanges(resync=True, version=board.version, last_seq=last_seq or board.changes_floor,
+                            has_more=False, changes=[])
+
+    rows = (await session.exec(select(BoardChange).where(
+        BoardChange.board_id == board.id, BoardChange.id > since).order_by(
+        BoardChange.id).limit(limit + 1))).all()
+    changes = [BoardChangeItem(seq=row.id, op=row.op, data=from_json(row.data)) for row in rows[:limit]]
+    return BoardChanges(resync=False, version=board.version,
+                        last_seq=changes[-1].seq if changes else since,
+                        has_more=len(rows) > limit, changes=changes)
+
+
+async def forward_events(websocket: WebSocket, subscription: Subscription):
+    while (message := await subscription.next()) is not None:
+        await websocket.send_text(message)
+    if subscription.closed:
+        await websocket.close(code=1000, reason="Board deleted")
+    else:
+        # The client fell too far behind, it catches up through the change log after reconnecting
+        await websocket.close(code=1013, reason="Lagging behind, resync from the change log")
+
+
+async def wait_disconnect(websocket: WebSocket):
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@board_router.websocket("/{board_id}/events", dependencies=[Depends(check_token)])
+async def board_events(websocket: WebSocket, board: Annotated[Board, Depends(query_board)],
+                       session: AsyncSessionDep):
+    """
+    Streams the changes of a board to the client as they are committed.
+
+    Every message is a JSON object with the `seq` of the change in the board change log,
+    `boardId`, the new board `version`, `op` and `data`, the same as in the change log.
+    A client which does not read fast enough is disconnected with code 1013 and resumes
+    from the last seq it got via GET /boards/{board_id}/changes. When the board is deleted,
+    the clients get a board.delete event and are disconnected with code 1000.
+
+    Args:
+        websocket (WebSocket): The connection of the client, authorized by the token cookie.
+        board (Board): The board instance fetched via the query_board dependency.
+        session (AsyncSessionDep): The database session used to authorize the client.
+    """
+    # The stream may stay open for hours, give the database connection back right away
+    await session.close()
+    subscription = board_broadcaster.subscribe(board.id)
+    try:
+        await websocket.accept()
+        tasks = {asyncio.create_task(forward_events(websocket, subscription)),
+                 asyncio.create_task(wait_disconnect(websocket))}
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            with suppress(WebSocketDisconnect):
+                task.result()
+    finally:
+        board_broadcaster.unsubscribe(subscription)
 
 
 @board_router.delete("/{board_id}", status_code=200, dependencies=[Depends(check_token)])
-async def del_board(board: Annotated[Board, Depends(query_board)], session: SessionDep):
-    session.delete(board)
-    session.commit()
+async def del_board(board: Annotated[Board, Depends(query_board)], session: AsyncSessionDep):
+    """
+    Deletes a board with a single statement, its columns, tasks and change log go by ON DELETE CASCADE.
+
+    Nothing is loaded into the session, so the cost doesn't depend on the board size in Python.
+    The subscribers of the board get a board.delete event, after which their streams are closed.
+    """
+    await record_changes(Board.id == board.id, [("board.delete", {"id": board.id})], session)
+    await session.exec(delete(Board).where(Board.id == board.id))
+    await session.commit()
 
 
 class TaskPatch(RestRequestModel):
@@ -134,46 +427,214 @@ class BoardPatch(RestRequestModel):
     columns: List[ColumnPatch]
 
 
+async def check_board_items(board_id: int, column_ids: set[int], task_ids: set[int],
+                            session: AsyncSessionDep) -> tuple[dict, dict]:
+    """
+    Checks with one query per table that all columns and tasks exist and belong to the board.
+
+    Returns:
+        tuple[dict, dict]: Current order numbers of the columns and of the tasks by id.
+
+    Raises:
+        HTTPException: If a column or task is not found on the board, with status code 404.
+    """
+    found_columns = dict((await session.exec(select(Column.id, Column.ord_num).where(
+        Column.id.in_(column_ids), Column.board_id == board_id))).all())
+    if len(found_columns) != len(column_ids):
+        raise HTTPException(status_code=404, detail="Column not found")
+
+    found_tasks = dict((await session.exec(select(Task.id, Task.ord_num).join(Column).where(
+        Task.id.in_(task_ids), Column.board_id == board_id))).all())
+    if len(found_tasks) != len(task_ids):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return found_columns, found_tasks
+
+
+def rerank_changed(rows: list[dict], ord_nums: dict):
+    # Only items whose order number changed are re-ranked, so ranks set by moves survive
+    for row in rows:
+        if row["ord_num"] != ord_nums[row["id"]]:
+            row["rank"] = rank_for_ordinal(row["ord_num"])
+
+
 @board_router.put("/{board_id}", status_code=200, dependencies=[Depends(check_token)])
-async def patch_board(new_board: BoardPatch, board: Annotated[Board, Depends(query_board)], session: SessionDep):
+async def patch_board(new_board: BoardPatch, board: Annotated[Board, Depends(query_board)], session: AsyncSessionDep):
     """
     Updates a specific board's title, columns, and tasks.
 
+    Columns and tasks are validated with one query per table and written with bulk
+    executemany updates in a single transaction. Items whose order number changed
+    get their rank recomputed from it.
+
     Args:
         new_board (BoardPatch): The updated board data, including the title, columns, and tasks.
         board (Board): The board instance to be updated, fetched via the query_board dependency.
-        session (SessionDep): The database session dependency for performing operations.
+        session (AsyncSessionDep): The database session dependency for performing operations.
 
     Raises:
-        HTTPException: If a column or task specified in the update is not found.
+        HTTPException: If a column or task specified in the update is not found on this board.
 
     Returns:
         None
     """
+    column_rows = [{"id": c.id, "title": c.title, "ord_num": c.order_number}
+                   for c in new_board.columns]
+    task_rows = [{"id": t.id, "title": t.title, "body": t.body, "ord_num": t.order_number}
+                 for c in new_board.columns for t in c.tasks]
+    column_ord_nums, task_ord_nums = await check_board_items(
+        board.id, {r["id"] for r in column_rows}, {r["id"] for r in task_rows}, session)
+    rerank_changed(column_rows, column_ord_nums)
+    rerank_changed(task_rows, task_ord_nums)
+
     board.title = new_board.title
     session.add(board)
+    await record_changes(Board.id == board.id, [("board.update", {"title": new_board.title})] + [
+        ("column.update", {"id": r["id"], "title": r["title"], "orderNumber": r["ord_num"]})
+        for r in column_rows] + [
+        ("task.update", {"id": r["id"], "title": r["title"], "description": r["body"],
+                         "orderNumber": r["ord_num"]})
+        for r in task_rows], session)
+    if column_rows:
+        await session.exec(update(Column), params=column_rows)
+    if task_rows:
+        await session.exec(update(Task), params=task_rows)
+    await session.commit()
 
-    for c in new_board.columns:
-        column = session.get(Column, c.id)
-        if not column:
-            raise HTTPException(status_code=404, detail="Column not found")
-        column.title = c.title
-        column.ord_num = c.order_number
-        session.add(column)
 
-        for t in c.tasks:
-            task = session.get(Task, t.id)
-            if not task:
-                raise HTTPException(status_code=404, detail="Task not found")
-            task.title = t.title
-            task.body = t.body
-            task.ord_num = t.order_number
-            session.add(task)
+class MoveRequest(RestRequestModel):
+    before_id: int | None = None
+    after_id: int | None = None
 
-    session.commit()
 
+async def anchor_rank(model, scope, anchor_id: int, session: AsyncSessionDep) -> str:
+    rank = (await session.exec(select(model.rank).where(scope, model.id == anchor_id))).first()
+    if rank is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    return rank
 
-task_router = APIRouter(prefix="/tasks")
+
+async def rank_for_move(model, scope, move: MoveRequest, item_id: int, session: AsyncSessionDep) -> str | None:
+    """
+    Computes a rank placing the item before move.before_id, after move.after_id or at the end.
+
+    Raises:
+        HTTPException: If the anchor is not found in scope or is the item itself, with status code 404.
+
+    Returns:
+        str | None: The new rank, or None if the neighbours share a rank and need rebalancing first.
+    """
+    # The item itself is no anchor: not found, as in TaskBatch.move
+    others_scope = and_(scope, model.id != item_id)
+    others = select(model.rank).where(others_scope)
+    if move.before_id is not None:
+        upper = await anchor_rank(model, others_scope, move.before_id, session)
+        lower = (await session.exec(others.where(
+            model.rank < upper).order_by(model.rank.desc()).limit(1))).first()
+    elif move.after_id is not None:
+        lower = await anchor_rank(model, others_scope, move.after_id, session)
+        upper = (await session.exec(others.where(
+            model.rank > lower).order_by(model.rank).limit(1))).first()
+    else:
+        lower = (await session.exec(others.order_by(model.rank.desc()).limit(1))).first()
+        upper = None
+    if upper is not None and (lower or "") >= upper:
+        return None
+    return rank_between(lower, upper)
+
+
+async def rebalance_ranks(model, scope, session: AsyncSession) -> tuple[str, dict]:
+    """
+    Rewrites the ranks and order numbers of all items in scope to short evenly spaced values.
+
+    Returns:
+        tuple[str, dict]: The renumber change log entry, listing the item IDs in their order.
+    """
+    ids = (await session.exec(select(model.id).where(scope).order_by(
+        model.rank, model.ord_num, model.id))).all()
+    if ids:
+        await session.exec(update(model), params=[
+            {"id": id, "ord_num": i, "rank": rank_for_ordinal(i)} for i, id in enumerate(ids)])
+    return (f"{model.__tablename__}.renumber", {"ids": list(ids)})
+
+
+async def rebalance_in_background(model, scope, boards, bind):
+    expect_write()
+    async with AsyncSession(bind) as session:
+        renumber = await rebalance_ranks(model, scope, session)
+        await record_changes(boards, [renumber], session)
+        await session.commit()
+
+
+async def move_item(model, scope, boards, move: MoveRequest, item_id: int, values: dict,
+                    change: tuple[str, dict], session: AsyncSessionDep, background_tasks: BackgroundTasks):
+    """
+    Moves an item by updating only its own row, rebalancing the scope when ranks run out.
+
+    The change is recorded for the boards matching the `boards` filter.
+    """
+    changes = [change]
+    rank = await rank_for_move(model, scope, move, item_id, session)
+    if rank is None:
+        changes.insert(0, await rebalance_ranks(model, scope, session))
+        rank = await rank_for_move(model, scope, move, item_id, session)
+    await session.exec(update(model).where(model.id == item_id).values(rank=rank, **values))
+    await record_changes(boards, changes, session)
+    await session.commit()
+    if len(rank) > rank_rebalance_length:
+        background_tasks.add_task(rebalance_in_background, model, scope, boards, session.bind)
+
+
+@board_router.post("/{board_id}/columns/{column_id}/move", status_code=200, dependencies=[Depends(check_token)])
+async def move_column(board_id: int, column_id: int, move: MoveRequest,
+                      session: AsyncSessionDep, background_tasks: BackgroundTasks):
+    """
+    Moves a column before or after another column of the same board, or to the end of the board.
+
+    Args:
+        board_id (int): The ID of the board.
+        column_id (int): The ID of the column to move.
+        move (MoveRequest): The ID of the column to place it before or after. With neither, the column goes last.
+        session (AsyncSessionDep): The database session dependency for performing operations.
+        background_tasks (BackgroundTasks): Used to rebalance ranks which got too long.
+
+    Raises:
+        HTTPException: If the column or the anchor column is not found on the board.
+
+    Returns:
+        None
+    """
+    scope = Column.board_id == board_id
+    await anchor_rank(Column, scope, column_id, session)
+    await move_item(Column, scope, Board.id == board_id, move, column_id, {},
+                    ("column.move", {"id": column_id, **move.model_dump(by_alias=True)}),
+                    session, background_tasks)
+
+
+@board_router.delete("/{board_id}/columns/{column_id}", status_code=200, dependencies=[Depends(check_token)])
+async def del_column(board_id: int, column_id: int, session: AsyncSessionDep):
+    """
+    Deletes a column of a board with a single statement, its tasks go by ON DELETE CASCADE.
+
+    Args:
+        board_id (int): The ID of the board.
+        column_id (int): The ID of the column to delete.
+        session (AsyncSessionDep): The database session dependency for performing operations.
+
+    Raises:
+        HTTPException: If the column is not found on the board.
+
+    Returns:
+        None
+    """
+    deleted = (await session.exec(delete(Column).where(
+        Column.id == column_id, Column.board_id == board_id).returning(Column.id))).first()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Column not found")
+    await record_changes(Board.id == board_id, [("column.delete", {"id": column_id})], session)
+    await session.commit()
+
+
+task_router = APIRouter(prefix="/tasks", route_class=LockRetryRoute)
 
 
 class TaskCreateRequest(RestRequestModel):
@@ -183,13 +644,18 @@ class TaskCreateRequest(RestRequestModel):
 
 
 @task_router.post("/new", status_code=200, dependencies=[Depends(check_token)])
-async def add_task(req: TaskCreateRequest, session: SessionDep):
+async def add_task(req: TaskCreateRequest, session: AsyncSessionDep):
     """
-    Adds a new task to a specific column.
+    Adds a new task to the end of a specific column.
+
+    The column check, its last rank and the next order number come from a single query.
+    The order number follows the highest one in the column rather than the one of the last
+    ranked task, which a move may have placed anywhere. Both subqueries only visit the
+    tasks of the column through the col_id index.
 
     Args:
         req (TaskCreateRequest): The request containing task details, including title, description, and column ID.
-        session (SessionDep): The database session dependency for performing operations.
+        session (AsyncSessionDep): The database session dependency for performing operations.
 
     Raises:
         HTTPException: If the specified column is not found.
@@ -197,31 +663,115 @@ async def add_task(req: TaskCreateRequest, session: SessionDep):
     Returns:
         None
     """
-    column = session.get(Column, req.column_id)
-    column.tasks.append(Task(
+    last_task = select_columns(Task.rank).where(
+        Task.col_id == Column.id).order_by(Task.rank.desc()).limit(1)
+    column = (await session.exec(select(
+        Column.id,
+        last_task.scalar_subquery(),
+        func.coalesce(select_columns(func.max(Task.ord_num)).where(
+            Task.col_id == Column.id).scalar_subquery() + 1, 0),
+    ).where(Column.id == req.column_id))).first()
+    if not column:
+        raise HTTPException(status_code=404, detail="Column not found")
+
+    _, last_rank, ord_num = column
+    task = Task(
         title=req.title,
         body=req.description,
-    ))
-    session.add(column)
-    session.commit()
+        col_id=req.column_id,
+        ord_num=ord_num,
+        rank=rank_between(last_rank, None),
+    )
+    session.add(task)
+    await session.flush()
+    await record_changes(boards_of_columns(req.column_id), [("task.create", {
+        "id": task.id, "columnId": task.col_id, "title": task.title,
+        "description": task.body, "orderNumber": task.ord_num,
+    })], session)
+    await session.commit()
+
+
+search_page_limit = 100
+
+
+class TaskSearchHit(RestRequestModel):
+    id: int
+    column_id: int
+    board_id: int
+    title: str
+    snippet: str
+
+
+def fts_query(q: str) -> str:
+    """
+    Turns free text into an FTS5 query for tasks having words that start with every term.
+
+    Terms are quoted, so FTS5 operators and stray quotes in the input are searched as text.
+    """
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in q.split())
+
+
+@task_router.get("/search", status_code=200, dependencies=[Depends(check_token)])
+async def search_tasks(
+    q: Annotated[str, Query(min_length=1)],
+    session: AsyncSessionDep,
+    response: Response,
+    board_id: int | None = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=search_page_limit)] = 20,
+) -> List[TaskSearchHit]:
+    """
+    Searches task titles and descriptions through the task_fts full-text index.
 
+    Args:
+        q (str): The search text, every word has to match the beginning of a word of the task.
+        session (AsyncSessionDep): The database session dependency for performing the query.
+        response (Response): Response object to set the X-Next-Cursor header on.
+        board_id (int | None): Restricts the search to the tasks of one board.
+        offset (int): Number of best hits to skip, the X-Next-Cursor of the previous page.
+        limit (int): Maximum number of hits in the page, capped by search_page_limit.
 
-async def query_task(task_id: int, session: SessionDep) -> Task:
-    task = session.get(Task, task_id)
+    Returns:
+        List[TaskSearchHit]: The tasks ordered by relevance, title matches weighing more than
+        description matches, with a snippet of the best matching text marked up with **.
+        If more hits follow, the X-Next-Cursor header holds the offset of the next page.
+    """
+    match = fts_query(q)
+    if not match:
+        return []
+    fts = literal_column("task_fts")
+    query = select_columns(
+        Task.id, Task.col_id.label("column_id"), Column.board_id, Task.title,
+        func.snippet(fts, -1, "**", "**", "…", 12).label("snippet"),
+    ).select_from(task_fts).join(Task, Task.id == task_fts.c.rowid).join(
+        Column, Column.id == Task.col_id).where(fts.match(match)).order_by(
+        func.bm25(fts, 10.0, 1.0)).limit(limit + 1).offset(offset)
+    if board_id is not None:
+        query = query.where(Column.board_id == board_id)
+    hits = [dict(row) for row in (await session.exec(query)).mappings()]
+    if len(hits) > limit:
+        response.headers["X-Next-Cursor"] = str(offset + limit)
+    return hits[:limit]
+
+
+async def query_task(task_id: int, session: AsyncSessionDep) -> Task:
+    task = await session.get(Task, task_id)
     if not task:
         raise HTTPException(detail="Task not found", status_code=404)
     return task
 
 
-@task_router.get("/{task_id}", status_code=200, dependencies=[Depends(check_token)])
-async def get_task(task: Annotated[Task, Depends(query_task)]):
+@task_router.get("/{task_id}", status_code=200, dependencies=[Depends(check_token)],
+                 response_model_by_alias=False)
+async def get_task(task: Annotated[Task, Depends(query_task)]) -> TaskRead:
     return task
 
 
 @task_router.delete("/{task_id}", status_code=200, dependencies=[Depends(check_token)])
-async def del_task(task: Annotated[Task, Depends(query_task)], session: SessionDep):
-    session.delete(task)
-    session.commit()
+async def del_task(task: Annotated[Task, Depends(query_task)], session: AsyncSessionDep):
+    await record_changes(boards_of_columns(task.col_id), [("task.delete", {"id": task.id})], session)
+    await session.delete(task)
+    await session.commit()
 
 
 class TaskPatchRequest(RestRequestModel):
@@ -230,23 +780,185 @@ class TaskPatchRequest(RestRequestModel):
     column_id: int
 
 
-@task_router.put("/{task_id}", status_code=200, dependencies=[Depends(check_token)])
-async def put_task(req: TaskPatchRequest, task: Annotated[Task, Depends(query_task)], session: SessionDep):
+@task_router.put("/{task_id}", status_code=200, dependencies=[Depends(check_token)],
+                 response_model_by_alias=False)
+async def put_task(req: TaskPatchRequest, task: Annotated[Task, Depends(query_task)], session: AsyncSessionDep) -> TaskRead:
     """
     Updates an existing task with new details.
 
     Args:
         req (TaskPatchRequest): The updated task details, including title, description, and column ID.
         task (Task): The task instance to be updated, fetched via the query_task dependency.
-        session (SessionDep): The database session dependency for performing operations.
+        session (AsyncSessionDep): The database session dependency for performing operations.
 
     Returns:
-        Task: The updated task instance with refreshed data from the database.
+        TaskRead: The updated task with refreshed data from the database.
+
+    Raises:
+        HTTPException: If the new column is not found.
     """
+    if req.column_id != task.col_id and not await session.get(Column, req.column_id):
+        raise HTTPException(status_code=404, detail="Column not found")
+    await record_changes(boards_of_columns(task.col_id, req.column_id), [("task.update", {
+        "id": task.id, "title": req.title, "description": req.description, "columnId": req.column_id,
+    })], session)
     task.title = req.title
     task.body = req.description
     task.col_id = req.column_id
     session.add(task)
-    session.commit()
-    session.refresh(task)
+    await session.commit()
+    await session.refresh(task)
     return task
+
+
+class TaskMoveRequest(MoveRequest):
+    column_id: int
+
+
+@task_router.post("/{task_id}/move", status_code=200, dependencies=[Depends(check_token)])
+async def move_task(req: TaskMoveRequest, task: Annotated[Task, Depends(query_task)],
+                    session: AsyncSessionDep, background_tasks: BackgroundTasks):
+    """
+    Moves a task into a column, before or after another task of that column or to its end.
+
+    Only the moved task's row is written: it gets a rank between its new neighbours.
+
+    Args:
+        req (TaskMoveRequest): The target column and the ID of the task to place it before or after.
+        task (Task): The task to move, fetched via the query_task dependency.
+        session (AsyncSessionDep): The database session dependency for performing operations.
+        background_tasks (BackgroundTasks): Used to rebalance ranks which got too long.
+
+    Raises:
+        HTTPException: If the column or the anchor task is not found.
+
+    Returns:
+        None
+    """
+    if not await session.get(Column, req.column_id):
+        raise HTTPException(status_code=404, detail="Column not found")
+    await move_item(Task, Task.col_id == req.column_id, boards_of_columns(task.col_id, req.column_id),
+                    req, task.id, {"col_id": req.column_id},
+                    ("task.move", {"id": task.id, **req.model_dump(by_alias=True)}),
+                    session, background_tasks)
+
+
+tasks_batch_limit = 1000
+
+
+class TaskBatchCreate(TaskCreateRequest):
+    op: Literal["create"]
+
+
+class TaskBatchUpdate(TaskPatchRequest):
+    op: Literal["update"]
+    id: int
+
+
+class TaskBatchMove(TaskMoveRequest):
+    op: Literal["move"]
+    id: int
+
+
+class TaskBatchDelete(RestRequestModel):
+    op: Literal["delete"]
+    id: int
+
+
+class TaskBatchRequest(RestRequestModel):
+    operations: List[Annotated[Union[TaskBatchCreate, TaskBatchUpdate, TaskBatchMove, TaskBatchDelete],
+                               Field(discriminator="op")]] = Field(max_length=tasks_batch_limit)
+
+
+class TaskBatchResult(RestRequestModel):
+    status: int
+    id: int | None = None
+    detail: str | None = None
+
+
+class TaskBatchResponse(RestRequestModel):
+    applied: bool
+    results: List[TaskBatchResult]
+
+
+async def plan_task_batch(operations: list, session: AsyncSessionDep) -> TaskBatch:
+    """
+    Loads the columns touched by the operations with three queries, whatever their number.
+    """
+    task_ids = {op.id for op in operations if op.op != "create"}
+    task_ids |= {anchor for op in operations if op.op == "move" for anchor in (op.before_id, op.after_id)}
+    col_ids = {op.column_id for op in operations if op.op != "delete"}
+    col_ids |= set((await session.exec(select(Task.col_id).where(Task.id.in_(task_ids - {None})))).all())
+    columns = dict((await session.exec(select(Column.id, Column.board_id).where(Column.id.in_(col_ids)))).all())
+    rows = (await session.exec(select(Task.col_id, Task.id, Task.rank, Task.ord_num).where(
+        Task.col_id.in_(columns)).order_by(Task.col_id, Task.rank, Task.ord_num, Task.id))).all()
+    return TaskBatch(columns, rows)
+
+
+def apply_batch_operation(batch: TaskBatch, op) -> TaskBatchResult:
+    try:
+        if op.op == "create":
+            id = batch.create(op.title, op.description, op.column_id)
+        elif op.op == "update":
+            id = batch.update(op.id, op.title, op.description, op.column_id)
+        elif op.op == "move":
+            id = batch.move(op.id, op.column_id, op.before_id, op.after_id)
+        else:
+            id = batch.delete(op.id)
+    except HTTPException as e:
+        return TaskBatchResult(status=e.status_code, detail=e.detail)
+    return TaskBatchResult(status=200, id=id)
+
+
+async def write_task_batch(batch: TaskBatch, session: AsyncSessionDep):
+    new_ids = []
+    if batch.new_rows:
+        # Ascending IDs come back in the order of the rows, as in log_changes
+        new_ids = sorted((await session.exec(insert(Task).returning(Task.id),
+                                             params=list(batch.new_rows.values()))).scalars().all())
+    batch.resolve(new_ids)
+    if batch.updates:
+        await session.exec(update(Task), params=list(batch.updates.values()))
+    if batch.deleted:
+        await session.exec(delete(Task).where(Task.id.in_(batch.deleted)))
+    for board_id, changes in batch.changes_by_board().items():
+        await record_changes(Board.id == board_id, changes, session)
+
+
+@task_router.post("/batch", status_code=200, dependencies=[Depends(check_token)])
+async def batch_tasks(req: TaskBatchRequest, response: Response, session: AsyncSessionDep,
+                      background_tasks: BackgroundTasks) -> TaskBatchResponse:
+    """
+    Applies a list of task create, update, move and delete operations in one transaction.
+
+    The operations are applied in order on an in-memory copy of the columns they touch and
+    then written with one insert, one bulk update and one delete, so the cost of the batch
+    hardly depends on the number of operations. Either all operations are applied or none.
+
+    Args:
+        req (TaskBatchRequest): The operations, each with the fields of the matching single task endpoint.
+        response (Response): Used to answer 409 if some operation can't be applied.
+        session (AsyncSessionDep): The database session dependency for performing operations.
+        background_tasks (BackgroundTasks): Used to rebalance ranks which got too long.
+
+    Returns:
+        TaskBatchResponse: Whether the batch was applied and a result per operation: the ID
+        of the task it affected, or the status and the reason it failed. If any operation
+        fails, the others get status 424 and nothing is written.
+    """
+    batch = await plan_task_batch(req.operations, session)
+    results = [apply_batch_operation(batch, op) for op in req.operations]
+    if any(result.status != 200 for result in results):
+        response.status_code = 409
+        return TaskBatchResponse(applied=False, results=[
+            result if result.status != 200 else TaskBatchResult(status=424, detail="Not applied")
+            for result in results])
+
+    await write_task_batch(batch, session)
+    await session.commit()
+    for col_id in batch.long_ranks(rank_rebalance_length):
+        background_tasks.add_task(rebalance_in_background, Task, Task.col_id == col_id,
+                                  Board.id == batch.columns[col_id], session.bind)
+    for result in results:
+        result.id = batch.resolved.get(result.id, result.id)
+    return TaskBatchResponse(applied=True, results=results)
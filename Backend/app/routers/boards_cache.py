@@ -0,0 +1,62 @@
+import os
+from collections import OrderedDict
+
+board_cache_bytes = int(os.environ.get("JOBAN_BOARD_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class BoardCache:
+    """
+    LRU cache of encoded GET /boards/{board_id} responses with a byte size budget.
+
+    Entries are keyed by board id and hold the body of one board version only,
+    so a bumped version never serves stale bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[int, bytes]] = OrderedDict()
+
+    def get(self, board_id: int, version: int) -> bytes | None:
+        entry = self._entries.get(board_id)
+        if entry and entry[0] == version:
+            self._entries.move_to_end(board_id)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, board_id: int, version: int, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        self.invalidate(board_id)
+        self._entries[board_id] = (version, body)
+        self.size_bytes += len(body)
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+
+    def invalidate(self, board_id: int):
+        entry = self._entries.pop(board_id, None)
+        if entry:
+            self.size_bytes -= len(entry[1])
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+board_cache = BoardCache(board_cache_bytes)
@@ -1,30 +1,94 @@
+from sqlalchemy import DDL, Index, column, event, table
 from sqlmodel import Field, SQLModel, Relationship
 
 
+class Counter(SQLModel, table=True):
+    """
+    Named counters which only ever go up, deleting rows elsewhere doesn't take them back.
+    """
+    name: str = Field(primary_key=True, max_length=40)
+    value: int = Field(default=0)
+
+
 class Board(SQLModel, table=True):
+    # Ids of deleted boards are never given out again, so an id with a version names one state
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id: int = Field(primary_key=True)
     title: str = Field(max_length=20)
+    # Set to the next value of the board_version counter on every write to the board, its columns or tasks
+    version: int = Field(default=0, index=True)
+    # Highest change log seq compacted away, clients behind it have to resync
+    changes_floor: int = Field(default=0)
 
     columns: list["Column"] = Relationship(
-        back_populates="board", cascade_delete=True)
+        back_populates="board", cascade_delete=True, passive_deletes=True,
+        sa_relationship_kwargs={"order_by": "Column.rank, Column.ord_num, Column.id"})
 
 
 class Column(SQLModel, table=True):
+    __table_args__ = (Index("ix_column_board_id_rank", "board_id", "rank"),)
+
     id: int = Field(primary_key=True)
-    board_id: int = Field(foreign_key="board.id")
+    # Deleting a board removes its columns, tasks and change log in the database, see del_board
+    board_id: int = Field(foreign_key="board.id", ondelete="CASCADE")
     title: str = Field(max_length=20)
     ord_num: int = Field(default=0)
+    # Lexicographic position of the column on the board, see boards_utils
+    rank: str = Field(default="")
 
     tasks: list["Task"] = Relationship(
-        back_populates="column", cascade_delete=True)
+        back_populates="column", cascade_delete=True, passive_deletes=True,
+        sa_relationship_kwargs={"order_by": "Task.rank, Task.ord_num, Task.id"})
     board: Board | None = Relationship(back_populates="columns")
 
 
 class Task(SQLModel, table=True):
+    __table_args__ = (Index("ix_task_col_id_rank", "col_id", "rank"),)
+
     id: int = Field(primary_key=True)
     title: str = Field(max_length=20)
     body: str = Field()
     ord_num: int = Field(default=0)
+    # Lexicographic position of the task in the column, see boards_utils
+    rank: str = Field(default="")
 
-    col_id: int = Field(foreign_key="column.id")
+    col_id: int = Field(foreign_key="column.id", ondelete="CASCADE")
     column: Column | None = Relationship(back_populates="tasks")
+
+
+# Full-text index over task titles and bodies. It is an external content FTS5 table: the
+# text lives in task only and the triggers keep the index in sync with every write path,
+# bulk statements and ON DELETE CASCADE included. Moves don't touch title or body, so
+# they don't touch the index either.
+task_fts = table("task_fts", column("rowid"), column("title"), column("body"))
+task_fts_ddl = [
+    "CREATE VIRTUAL TABLE task_fts USING fts5(title, body, content='task', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER task_fts_insert AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER task_fts_delete AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER task_fts_update AFTER UPDATE OF title, body ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO task_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+for statement in task_fts_ddl:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+class BoardChange(SQLModel, table=True):
+    """
+    Append-only log of board, column and task writes, written in the same transaction.
+
+    The id is the sequence number clients sync from, AUTOINCREMENT keeps it from being reused.
+    """
+    __table_args__ = (Index("ix_boardchange_board_id_id", "board_id", "id"),
+                      {"sqlite_autoincrement": True})
+
+    id: int = Field(primary_key=True)
+    board_id: int = Field(foreign_key="board.id", ondelete="CASCADE")
+    op: str = Field(max_length=20)
+    # JSON encoded operation payload
+    data: str = Field()
+    created_at: int = Field(index=True)
@@ -0,0 +1,59 @@
+rank_digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+rank_width = 5
+rank_offset = len(rank_digits) ** rank_width // 2
+# Ranks longer than this are rebalanced in the background after a move
+rank_rebalance_length = 12
+
+
+def rank_for_ordinal(n: int) -> str:
+    """
+    Converts an order number into a fixed width rank, so ranks sort like the order numbers.
+
+    The middle digit suffix leaves room to insert ranks before and after it.
+    """
+    return _encode_rank(min(max(n + rank_offset, 0), len(rank_digits) ** rank_width - 1))
+
+
+def _encode_rank(value: int) -> str:
+    rank = ""
+    for _ in range(rank_width):
+        value, digit = divmod(value, len(rank_digits))
+        rank = rank_digits[digit] + rank
+    return rank + rank_digits[len(rank_digits) // 2]
+
+
+def rank_between(lower: str | None, upper: str | None) -> str:
+    """
+    Returns a rank which sorts strictly between lower and upper.
+
+    None stands for the start or the end of the list. Ranks never end with the zero digit,
+    so there is always room for one more between any two of them. Appending after the last
+    rank increments its leading digits instead of taking a midpoint, so ranks of items added
+    one after another keep the width of rank_for_ordinal rather than growing with each one.
+    """
+    if upper is None and not lower:
+        return rank_for_ordinal(0)
+    if upper is None:
+        value = 0
+        for digit in lower[:rank_width].ljust(rank_width, rank_digits[0]):
+            value = value * len(rank_digits) + rank_digits.index(digit)
+        if value + 1 < len(rank_digits) ** rank_width:
+            return _encode_rank(value + 1)
+    return _midpoint(lower or "", upper)
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else rank_digits[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = rank_digits.index(a[0]) if a else 0
+    digit_b = rank_digits.index(b[0]) if b is not None else len(rank_digits)
+    if digit_b - digit_a > 1:
+        return rank_digits[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return rank_digits[digit_a] + _midpoint(a[1:], None)
@@ -0,0 +1,167 @@
+from fastapi import HTTPException
+
+from app.routers.boards_utils import rank_between, rank_for_ordinal
+
+
+class TaskBatch:
+    """
+    Plans a batch of task operations against an in-memory copy of the columns it touches.
+
+    Operations are applied one after another, so later operations see the effect of the
+    earlier ones. Nothing is written here: the planned rows, updates, deletions and change
+    log entries are collected for a few bulk statements. New tasks get negative placeholder
+    IDs until they are inserted, see resolve().
+    """
+
+    def __init__(self, columns: dict[int, int], rows: list):
+        """
+        Args:
+            columns (dict[int, int]): Board IDs of the columns referenced by the batch.
+            rows (list): (col_id, id, rank, ord_num) of every task in those columns,
+                ordered by rank, ord_num and id.
+        """
+        self.tasks = {}
+        self.columns = columns
+        self.orders = {col_id: [] for col_id in columns}
+        self.ranks = {}
+        self.next_ord_num = {col_id: 0 for col_id in columns}
+        for col_id, id, rank, ord_num in rows:
+            self.orders[col_id].append(id)
+            self.tasks[id] = col_id
+            self.ranks[id] = rank
+            self.next_ord_num[col_id] = max(self.next_ord_num[col_id], ord_num + 1)
+        self.new_rows = {}
+        self.updates = {}
+        self.deleted = set()
+        self.changes = []
+        self.resolved = {}
+
+    def column(self, col_id: int) -> int:
+        if col_id not in self.columns:
+            raise HTTPException(status_code=404, detail="Column not found")
+        return col_id
+
+    def task(self, id: int) -> int:
+        # Tasks created by the batch have no ID the client could know yet
+        if id < 0 or id not in self.tasks:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return self.tasks[id]
+
+    def write(self, id: int, **values):
+        if id < 0:
+            self.new_rows[id].update(values)
+        else:
+            self.updates.setdefault(id, {"id": id}).update(values)
+
+    def record(self, col_ids, op: str, data: dict):
+        self.changes.append(({self.columns[col_id] for col_id in col_ids}, op, data))
+
+    def create(self, title: str, description: str, col_id: int) -> int:
+        order = self.orders[self.column(col_id)]
+        id = -len(self.new_rows) - 1
+        rank = rank_between(self.ranks[order[-1]] if order else None, None)
+        self.new_rows[id] = {"title": title, "body": description, "col_id": col_id,
+                             "ord_num": self.next_ord_num[col_id], "rank": rank}
+        self.next_ord_num[col_id] += 1
+        self.tasks[id] = col_id
+        self.ranks[id] = rank
+        order.append(id)
+        self.record([col_id], "task.create", {"id": id, "columnId": col_id, "title": title,
+                                              "description": description, "orderNumber": self.new_rows[id]["ord_num"]})
+        return id
+
+    def update(self, id: int, title: str, description: str, col_id: int) -> int:
+        old_col_id = self.task(id)
+        self.column(col_id)
+        if col_id != old_col_id:
+            # Like PUT /tasks/{id}, the task keeps its rank in the new column
+            self.orders[old_col_id].remove(id)
+            order = self.orders[col_id]
+            position = next((i for i, other in enumerate(order) if self.ranks[other] > self.ranks[id]), len(order))
+            order.insert(position, id)
+            self.tasks[id] = col_id
+        self.write(id, title=title, body=description, col_id=col_id)
+        self.record([old_col_id, col_id], "task.update", {
+            "id": id, "title": title, "description": description, "columnId": col_id})
+        return id
+
+    def move(self, id: int, col_id: int, before_id: int | None, after_id: int | None) -> int:
+        old_col_id = self.task(id)
+        self.column(col_id)
+        for anchor_id in (before_id, after_id):
+            if anchor_id is not None and (anchor_id == id or anchor_id < 0 or self.tasks.get(anchor_id) != col_id):
+                raise HTTPException(status_code=404, detail="Task not found")
+        rank, position = self.place(id, col_id, before_id, after_id)
+        if rank is None:
+            self.renumber(col_id)
+            rank, position = self.place(id, col_id, before_id, after_id)
+        self.orders[old_col_id].remove(id)
+        self.orders[col_id].insert(position, id)
+        self.tasks[id] = col_id
+        self.ranks[id] = rank
+        self.write(id, rank=rank, col_id=col_id)
+        self.record([old_col_id, col_id], "task.move", {
+            "id": id, "columnId": col_id, "beforeId": before_id, "afterId": after_id})
+        return id
+
+    def place(self, id: int, col_id: int, before_id: int | None, after_id: int | None) -> tuple[str | None, int]:
+        """
+        Finds the rank and the position in the column order for a task, see rank_for_move.
+        """
+        others = [other for other in self.orders[col_id] if other != id]
+        if before_id is not None:
+            position = others.index(before_id)
+        elif after_id is not None:
+            position = others.index(after_id) + 1
+        else:
+            position = len(others)
+        lower = self.ranks[others[position - 1]] if position > 0 else None
+        upper = self.ranks[others[position]] if position < len(others) else None
+        if upper is not None and (lower or "") >= upper:
+            return None, position
+        return rank_between(lower, upper), position
+
+    def renumber(self, col_id: int):
+        order = self.orders[col_id]
+        for i, id in enumerate(order):
+            self.ranks[id] = rank_for_ordinal(i)
+            self.write(id, ord_num=i, rank=self.ranks[id])
+        self.next_ord_num[col_id] = max(self.next_ord_num[col_id], len(order))
+        self.record([col_id], "task.renumber", {"ids": list(order)})
+
+    def delete(self, id: int) -> int:
+        col_id = self.task(id)
+        self.orders[col_id].remove(id)
+        del self.tasks[id]
+        self.updates.pop(id, None)
+        self.deleted.add(id)
+        self.record([col_id], "task.delete", {"id": id})
+        return id
+
+    def resolve(self, new_ids: list[int]):
+        """
+        Replaces the placeholder IDs of the new tasks with the IDs they got on insert.
+
+        Args:
+            new_ids (list[int]): The inserted IDs in the order of new_rows.
+        """
+        self.resolved = dict(zip(self.new_rows, new_ids))
+        for _, op, data in self.changes:
+            if op == "task.renumber":
+                data["ids"] = [self.resolved.get(id, id) for id in data["ids"]]
+            elif data["id"] < 0:
+                data["id"] = self.resolved[data["id"]]
+
+    def changes_by_board(self) -> dict[int, list[tuple[str, dict]]]:
+        boards = {}
+        for board_ids, op, data in self.changes:
+            for board_id in board_ids:
+                boards.setdefault(board_id, []).append((op, data))
+        return boards
+
+    def long_ranks(self, length: int) -> set[int]:
+        """
+        Returns the columns which got a rank longer than length, they need rebalancing.
+        """
+        return {col_id for id, col_id in self.tasks.items() if len(self.ranks.get(id, "")) > length
+                and (id < 0 or "rank" in self.updates.get(id, {}))}
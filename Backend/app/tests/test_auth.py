@@ -1,7 +1,18 @@
+import asyncio
 import hashlib
+import time
+import httpx
 import pytest
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .test_base import client
+from .test_base import client, count_queries, async_engine
+from ..main import app
+from ..routers.auth import purge_expired_tokens
+from ..routers.auth_cache import token_cache
+from ..routers.auth_db import TokenStore, User
+from ..routers.auth_passwords import password_hasher
 
 
 @pytest.mark.dependency()
@@ -15,10 +26,10 @@ def test_reg():
                        })
     assert resp.status_code == 201
 
-    hasher = hashlib.sha256()
-    hasher.update(("1234" + resp.json().get("salt")).encode())
-
-    assert resp.json().get("password_hash") == hasher.hexdigest()
+    password_hash = resp.json().get("password_hash")
+    assert password_hash.startswith("scrypt$")
+    assert asyncio.run(password_hasher.verify("1234", resp.json().get("salt"), password_hash))
+    assert not asyncio.run(password_hasher.verify("4321", resp.json().get("salt"), password_hash))
 
     resp = client.post("/auth/register",
                        json={
@@ -30,6 +41,24 @@ def test_reg():
     assert resp.status_code == 409
 
 
+async def register_concurrently(login: str, count: int) -> list[httpx.Response]:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await asyncio.gather(*[client.post("/auth/register", json={
+            "first_name": "joey", "last_name": "tribbiani", "login": login, "password": "1234"
+        }) for _ in range(count)])
+
+
+async def count_users(login: str) -> int:
+    async with AsyncSession(async_engine) as session:
+        return (await session.exec(select(func.count()).select_from(User).where(User.login == login))).one()
+
+
+def test_concurrent_registration():
+    responses = asyncio.run(register_concurrently("joey", 5))
+    assert sorted(resp.status_code for resp in responses) == [201, 409, 409, 409, 409]
+    assert asyncio.run(count_users("joey")) == 1
+
+
 @pytest.mark.dependency(depends=["test_reg"])
 def test_login():
     login_wrong_user = client.post("/auth/login",
@@ -83,3 +112,100 @@ def test_logout():
     logout_resp = client.post(
         "/auth/logout", cookies={"DxpAccessToken": login_resp.cookies.get("DxpAccessToken")})
     assert logout_resp.text == '"logout"'
+
+
+@pytest.mark.dependency(depends=["test_login"])
+def test_token_cache():
+    login_resp = client.post("/auth/login",
+                             json={
+                                 "login": "ross",
+                                 "password": "1234"
+                             })
+    cookies = {"DxpAccessToken": login_resp.cookies.get("DxpAccessToken")}
+    assert client.get("/auth/protected", cookies=cookies).status_code == 200
+
+    with count_queries() as statements:
+        hits = client.get("/auth/cache", cookies=cookies).json().get("hits")
+        assert client.get("/auth/protected", cookies=cookies).status_code == 200
+    assert statements == []
+    assert client.get("/auth/cache", cookies=cookies).json().get("hits") == hits + 2
+
+    client.post("/auth/logout", cookies=cookies)
+    assert client.get("/auth/protected", cookies=cookies).status_code == 401
+
+
+@pytest.mark.dependency(depends=["test_login"])
+def test_current_user():
+    login_resp = client.post("/auth/login",
+                             json={
+                                 "login": "ross",
+                                 "password": "1234"
+                             })
+    cookies = {"DxpAccessToken": login_resp.cookies.get("DxpAccessToken")}
+
+    token_cache.clear()
+    with count_queries() as statements:
+        whoami_resp = client.get("/auth/whoami", cookies=cookies)
+    assert whoami_resp.json() == {"displayName": "robot bobot"}
+    assert len(statements) == 1
+
+    with count_queries() as statements:
+        whoami_resp = client.get("/auth/whoami", cookies=cookies)
+    assert whoami_resp.json() == {"displayName": "robot bobot"}
+    assert len(statements) == 1
+
+    whoami_resp = client.get("/auth/whoami", cookies={"DxpAccessToken": "invalid"})
+    assert whoami_resp.status_code == 401
+
+
+async def add_tokens_and_purge():
+    async with AsyncSession(async_engine) as session:
+        for i in range(5):
+            session.add(TokenStore(login="ross", token=f"expired{i}",
+                                   exp_time=int(time.time()) - 1))
+        session.add(TokenStore(login="ross", token="alive",
+                               exp_time=int(time.time()) + 3600))
+        await session.commit()
+        return await purge_expired_tokens(session, batch_size=2)
+
+
+@pytest.mark.dependency(depends=["test_reg"])
+def test_purge_expired_tokens():
+    assert asyncio.run(add_tokens_and_purge()) == 5
+
+    resp = client.get("/auth/protected", cookies={"DxpAccessToken": "expired0"})
+    assert resp.status_code == 401
+    resp = client.get("/auth/protected", cookies={"DxpAccessToken": "alive"})
+    assert resp.status_code == 200
+
+
+async def add_legacy_user() -> User:
+    async with AsyncSession(async_engine) as session:
+        hasher = hashlib.sha256()
+        hasher.update(("1234" + "legacysalt").encode())
+        session.add(User(first_name="old", last_name="timer", login="legacy",
+                         salt="legacysalt", password_hash=hasher.hexdigest()))
+        await session.commit()
+
+
+async def stored_password_hash(login: str) -> str:
+    async with AsyncSession(async_engine) as session:
+        return (await session.exec(select(User.password_hash).where(User.login == login))).first()
+
+
+@pytest.mark.dependency(depends=["test_reg"])
+def test_legacy_password_upgrade():
+    asyncio.run(add_legacy_user())
+
+    resp = client.post("/auth/login", json={"login": "legacy", "password": "4321"})
+    assert resp.status_code == 401
+    assert not asyncio.run(stored_password_hash("legacy")).startswith("scrypt$")
+
+    resp = client.post("/auth/login", json={"login": "legacy", "password": "1234"})
+    assert resp.status_code == 200
+    upgraded = asyncio.run(stored_password_hash("legacy"))
+    assert not password_hasher.needs_rehash(upgraded)
+
+    resp = client.post("/auth/login", json={"login": "legacy", "password": "1234"})
+    assert resp.status_code == 200
+    assert asyncio.run(stored_password_hash("legacy")) == upgraded
@@ -1,22 +1,87 @@
+import asyncio
+from contextlib import contextmanager
+
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
 from ..main import app
-from ..db import get_session
+from .. import query_stats
+from ..db import configure_engine, get_session, get_async_session, sqlite_pragmas, use_sqlite_pragmas
 
 engine = engine = create_engine(
     "sqlite://",
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+use_sqlite_pragmas(engine, sqlite_pragmas("default"))
 SQLModel.metadata.create_all(engine)
 
+async_engine = create_async_engine(
+    "sqlite+aiosqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+configure_engine(async_engine.sync_engine, sqlite_pragmas("default"))
+
+
+async def create_async_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+asyncio.run(create_async_tables())
+
+
+@contextmanager
+def count_queries():
+    """
+    Collects the SQL statements executed on the test database inside the block.
+    """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+
+def assert_query_count_constant(request, sizes=(1, 10)):
+    """
+    Fails when the number of statements behind a request grows with the payload size.
+
+    Args:
+        request (Callable[[int], Response]): Sends the request for a payload of the given size.
+        sizes (tuple[int, ...]): The payload sizes to compare.
+    """
+    counts = {}
+    for size in sizes:
+        resp = request(size)
+        assert resp.status_code < 400, resp.text
+        counts[size] = int(resp.headers["Server-Timing"].split('desc="')[1].split(" ")[0])
+    assert len(set(counts.values())) == 1, f"Query count grows with the payload size: {counts}"
+
+
+# Tests read the per-request query counts from the Server-Timing header
+query_stats.server_timing = True
+
 
 def get_session_override():
     with Session(engine) as session:
         return session
 
 
+async def get_async_session_override():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 app.dependency_overrides[get_session] = get_session_override
+app.dependency_overrides[get_async_session] = get_async_session_override
 client = TestClient(app)
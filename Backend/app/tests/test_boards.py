@@ -1,4 +1,19 @@
-from .test_base import client
+import asyncio
+import json
+import time
+from contextlib import ExitStack
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.testclient import WebSocketDenialResponse
+from starlette.websockets import WebSocketDisconnect
+
+from .test_base import client, count_queries, async_engine, assert_query_count_constant
+from ..routers.boards import BoardResponse
+from ..routers.boards_cache import board_cache
+from ..routers.boards_db import BoardChange, Column, Task
+from ..routers.board_changes import compact_change_log, publish_logged_changes
+from ..routers import board_events
+from ..routers.board_events import BoardBroadcaster, board_broadcaster
 
 import pytest
 
@@ -152,3 +167,641 @@ def test_board_put():
             }
         ]
     }
+
+
+def board_get_queries(columns: int, tasks: int) -> int:
+    resp = client.post("/boards/new",
+                       json={
+                           "title": "query board",
+                           "columns": [
+                               {
+                                   "title": f"column {i}",
+                                   "orderNumber": columns - i
+                               } for i in range(columns)
+                           ]
+                       },
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    board_id = resp.json().get("id")
+    board = client.get(f"/boards/{board_id}",
+                       cookies={"DxpAccessToken": pytest.token}
+                       ).json()
+    for col in board.get("columns"):
+        for i in range(tasks):
+            client.post("/tasks/new",
+                        json={
+                            "title": f"task {i}",
+                            "description": "",
+                            "columnId": col.get("id")
+                        },
+                        cookies={"DxpAccessToken": pytest.token}
+                        )
+
+    board_cache.clear()
+    with count_queries() as statements:
+        resp = client.get(f"/boards/{board_id}",
+                          cookies={"DxpAccessToken": pytest.token}
+                          )
+    order = [col.get("orderNumber") for col in resp.json().get("columns")]
+    assert order == sorted(order)
+    assert all(len(col.get("tasks")) == tasks for col in resp.json().get("columns"))
+
+    client.delete(f"/boards/{board_id}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+    return len(statements)
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_get_query_count():
+    assert board_get_queries(1, 0) == board_get_queries(8, 10)
+
+
+def create_filled_board(columns: int, tasks: int) -> dict:
+    resp = client.post("/boards/new",
+                       json={
+                           "title": "filled board",
+                           "columns": [
+                               {
+                                   "title": f"column {i}",
+                                   "orderNumber": i
+                               } for i in range(columns)
+                           ]
+                       },
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    board_id = resp.json().get("id")
+    for col in client.get(f"/boards/{board_id}",
+                          cookies={"DxpAccessToken": pytest.token}
+                          ).json().get("columns"):
+        for i in range(tasks):
+            client.post("/tasks/new",
+                        json={
+                            "title": f"task {i}",
+                            "description": "",
+                            "columnId": col.get("id")
+                        },
+                        cookies={"DxpAccessToken": pytest.token}
+                        )
+    return client.get(f"/boards/{board_id}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      ).json()
+
+
+def board_put_queries(board: dict) -> int:
+    for col in board.get("columns"):
+        col["title"] = col["title"] + " changed"
+        for t in col.get("tasks"):
+            t["body"] = "changed"
+    with count_queries() as statements:
+        resp = client.put(f"/boards/{board.get('id')}",
+                          json=board,
+                          cookies={"DxpAccessToken": pytest.token}
+                          )
+    assert resp.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_put_bulk():
+    small = create_filled_board(1, 1)
+    big = create_filled_board(5, 20)
+    assert board_put_queries(small) == board_put_queries(big)
+
+    resp = client.get(f"/boards/{big.get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert all(col.get("title").endswith(" changed")
+               for col in resp.json().get("columns"))
+    assert all(t.get("description") == "changed"
+               for col in resp.json().get("columns") for t in col.get("tasks"))
+
+    foreign = dict(small, columns=big.get("columns")[:1])
+    resp = client.put(f"/boards/{small.get('id')}",
+                      json=foreign,
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 404
+
+    foreign = dict(small)
+    foreign["columns"][0]["tasks"] = big.get("columns")[0].get("tasks")
+    resp = client.put(f"/boards/{small.get('id')}",
+                      json=foreign,
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 404
+
+    for board in (small, big):
+        client.delete(f"/boards/{board.get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_list_pages():
+    created = [client.post("/boards/new",
+                           json={"title": f"page board {i}", "columns": []},
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).json().get("id") for i in range(5)]
+
+    ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "after": cursor}
+        resp = client.get("/boards", params=params,
+                          cookies={"DxpAccessToken": pytest.token}
+                          )
+        assert resp.status_code == 200
+        assert len(resp.json()) <= 2
+        ids += [b.get("id") for b in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert ids == sorted(ids)
+    assert set(created) <= set(ids)
+
+    resp = client.get("/boards", params={"fields": "id"},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert all(b.keys() == {"id"} for b in resp.json())
+    resp = client.get("/boards", params={"fields": "id,version"},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert all(b.keys() == {"id", "version"} for b in resp.json())
+    for fields in ("password", "changes_floor"):
+        resp = client.get("/boards", params={"fields": fields},
+                          cookies={"DxpAccessToken": pytest.token}
+                          )
+        assert resp.status_code == 422
+    resp = client.get("/boards", params={"limit": 100000},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 422
+
+    for board_id in created:
+        client.delete(f"/boards/{board_id}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_response_shape():
+    board = create_filled_board(2, 2)
+    board_cache.clear()
+    resp = client.get(f"/boards/{board.get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    # encode_board bypasses response_model, the body has to be what BoardResponse would serialize
+    model = BoardResponse.model_validate_json(resp.content)
+    assert model.model_dump_json(by_alias=True).encode() == resp.content
+    assert [len(col.tasks) for col in model.columns] == [2, 2]
+
+    client.delete(f"/boards/{board.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_etag():
+    list_etag = client.get("/boards",
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).headers.get("ETag")
+    board = create_filled_board(2, 3)
+    resp = client.get("/boards",
+                      headers={"If-None-Match": list_etag},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 200
+    list_etag = resp.headers.get("ETag")
+    resp = client.get("/boards",
+                      headers={"If-None-Match": list_etag},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 304
+
+    etag = client.get(f"/boards/{board.get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      ).headers.get("ETag")
+    with count_queries() as statements:
+        resp = client.get(f"/boards/{board.get('id')}",
+                          headers={"If-None-Match": etag},
+                          cookies={"DxpAccessToken": pytest.token}
+                          )
+    assert resp.status_code == 304
+    assert len(statements) == 1
+
+    task = board.get("columns")[0].get("tasks")[0]
+    client.put(f"/tasks/{task.get('id')}",
+               json={"title": "new", "description": "", "columnId": task.get("columnId")},
+               cookies={"DxpAccessToken": pytest.token}
+               )
+    resp = client.get(f"/boards/{board.get('id')}",
+                      headers={"If-None-Match": etag},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 200
+    assert resp.headers.get("ETag") != etag
+
+    client.delete(f"/boards/{board.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+    resp = client.get("/boards",
+                      headers={"If-None-Match": list_etag},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 200
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_etag_after_delete():
+    deleted = create_filled_board(1, 0)
+    list_etag = client.get("/boards",
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).headers.get("ETag")
+    board_etag = client.get(f"/boards/{deleted.get('id')}",
+                            cookies={"DxpAccessToken": pytest.token}
+                            ).headers.get("ETag")
+    client.delete(f"/boards/{deleted.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+    # The newest board is gone, its id and its version must not come back
+    board = create_filled_board(1, 0)
+    assert board.get("id") > deleted.get("id")
+    resp = client.get("/boards",
+                      headers={"If-None-Match": list_etag},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 200
+    resp = client.get(f"/boards/{board.get('id')}",
+                      headers={"If-None-Match": board_etag},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 200
+    assert resp.headers.get("ETag") != board_etag
+
+    with count_queries() as statements:
+        client.get("/boards",
+                   headers={"If-None-Match": resp.headers.get("ETag")},
+                   cookies={"DxpAccessToken": pytest.token}
+                   )
+    assert not any("count(" in statement for statement in statements)
+
+    client.delete(f"/boards/{board.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_cache():
+    board = create_filled_board(2, 3)
+    board_cache.clear()
+    hits = board_cache.stats().get("hits")
+    first = client.get(f"/boards/{board.get('id')}",
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    with count_queries() as statements:
+        second = client.get(f"/boards/{board.get('id')}",
+                            cookies={"DxpAccessToken": pytest.token}
+                            )
+    assert second.content == first.content
+    assert len(statements) == 1
+
+    stats = client.get("/boards/cache",
+                       cookies={"DxpAccessToken": pytest.token}
+                       ).json()
+    assert stats.get("hits") == hits + 1
+    assert stats.get("size_bytes") == len(first.content)
+
+    client.post("/tasks/new",
+                json={"title": "fresh", "description": "",
+                      "columnId": board.get("columns")[0].get("id")},
+                cookies={"DxpAccessToken": pytest.token}
+                )
+    assert board_cache.stats().get("size") == 0
+    resp = client.get(f"/boards/{board.get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.json().get("columns")[0].get("tasks")[-1].get("title") == "fresh"
+
+    client.delete(f"/boards/{board.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+    assert board_cache.stats().get("size") == 0
+
+
+async def compact_all_changes():
+    async with AsyncSession(async_engine) as session:
+        return await compact_change_log(session, max_age=-1)
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_changes():
+    board = create_filled_board(2, 1)
+    changes = client.get(f"/boards/{board.get('id')}/changes",
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json()
+    assert changes.get("resync") is False
+    assert [c.get("op") for c in changes.get("changes")] == ["board.create", "task.create", "task.create"]
+    since = changes.get("lastSeq")
+
+    first, second = board.get("columns")
+    task = first.get("tasks")[0]
+    client.post(f"/tasks/{task.get('id')}/move",
+                json={"columnId": second.get("id")},
+                cookies={"DxpAccessToken": pytest.token}
+                )
+    client.delete(f"/tasks/{second.get('tasks')[0].get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+    changes = client.get(f"/boards/{board.get('id')}/changes",
+                         params={"since": since, "limit": 1},
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json()
+    assert changes.get("hasMore") is True
+    assert changes.get("changes")[0].get("op") == "task.move"
+    assert changes.get("changes")[0].get("data") == {
+        "id": task.get("id"), "columnId": second.get("id"), "beforeId": None, "afterId": None}
+    changes = client.get(f"/boards/{board.get('id')}/changes",
+                         params={"since": changes.get("lastSeq")},
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json()
+    assert [c.get("op") for c in changes.get("changes")] == ["task.delete"]
+    assert changes.get("hasMore") is False
+
+    assert asyncio.run(compact_all_changes()) > 0
+    changes = client.get(f"/boards/{board.get('id')}/changes",
+                         params={"since": since},
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json()
+    assert changes.get("resync") is True
+    assert changes.get("changes") == []
+
+    client.delete(f"/boards/{board.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_events():
+    board = create_filled_board(1, 0)
+    column_id = board.get("columns")[0].get("id")
+
+    with pytest.raises(WebSocketDenialResponse) as denied:
+        with client.websocket_connect(f"/boards/{board.get('id')}/events"):
+            pass
+    assert denied.value.status_code == 401
+
+    with ExitStack() as stack:
+        sockets = [stack.enter_context(client.websocket_connect(f"/boards/{board.get('id')}/events",
+                                                                cookies={"DxpAccessToken": pytest.token}))
+                   for _ in range(3)]
+        assert board_broadcaster.stats().get("subscribers") == 3
+        client.post("/tasks/new",
+                    json={
+                        "title": "pushed",
+                        "description": "",
+                        "columnId": column_id
+                    },
+                    cookies={"DxpAccessToken": pytest.token}
+                    )
+        for socket in sockets:
+            event = socket.receive_json()
+            assert event.get("op") == "task.create"
+            assert event.get("boardId") == board.get("id")
+            assert event.get("data").get("title") == "pushed"
+    assert board_broadcaster.stats().get("subscribers") == 0
+
+    client.delete(f"/boards/{board.get('id')}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_events_delete():
+    board = create_filled_board(1, 0)
+    with client.websocket_connect(f"/boards/{board.get('id')}/events",
+                                  cookies={"DxpAccessToken": pytest.token}) as socket:
+        resp = client.delete(f"/boards/{board.get('id')}",
+                             cookies={"DxpAccessToken": pytest.token}
+                             )
+        assert resp.status_code == 200
+        event = socket.receive_json()
+        assert event.get("op") == "board.delete"
+        assert event.get("data") == {"id": board.get("id")}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+        assert closed.value.code == 1000
+    assert board_broadcaster.stats().get("subscribers") == 0
+
+
+async def delete_from_change_log(board_id: int) -> list[dict]:
+    async with AsyncSession(async_engine) as session:
+        after = await publish_logged_changes(session, None)
+    subscription = board_broadcaster.subscribe(board_id)
+    # Deleted by "another worker", its change log goes with it
+    resp = client.delete(f"/boards/{board_id}", cookies={"DxpAccessToken": pytest.token})
+    assert resp.status_code == 200
+    async with AsyncSession(async_engine) as session:
+        await publish_logged_changes(session, after)
+    messages = []
+    while (message := await subscription.next()) is not None:
+        messages.append(json.loads(message))
+    board_broadcaster.unsubscribe(subscription)
+    return messages, subscription.closed
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_events_delete_from_change_log(monkeypatch):
+    # Only the change log publishes, as with several workers
+    monkeypatch.setattr(board_events, "events_poll_interval", 0.05)
+    board = create_filled_board(1, 0)
+    messages, closed = asyncio.run(delete_from_change_log(board.get("id")))
+    assert [m["op"] for m in messages] == ["board.delete"]
+    assert closed
+
+
+async def fan_out(subscribers: int, events: int) -> tuple[float, list[list[int]]]:
+    broadcaster = BoardBroadcaster(max_pending=events)
+    subscriptions = [broadcaster.subscribe(1) for _ in range(subscribers)]
+    latencies = []
+
+    async def consume(subscription) -> list[int]:
+        seqs = []
+        while len(seqs) < events:
+            message = await subscription.next()
+            latencies.append(time.perf_counter() - sent[int(message)])
+            seqs.append(int(message))
+        return seqs
+
+    sent = {}
+    consumers = [asyncio.create_task(consume(subscription)) for subscription in subscriptions]
+    await asyncio.sleep(0)
+    for seq in range(events):
+        sent[seq] = time.perf_counter()
+        broadcaster.publish(1, [seq])
+        await asyncio.sleep(0)
+    received = await asyncio.gather(*consumers)
+    return max(latencies), received
+
+
+def test_board_events_fan_out():
+    latency, received = asyncio.run(fan_out(subscribers=500, events=20))
+    assert all(seqs == list(range(20)) for seqs in received)
+    assert latency < 0.5
+
+
+async def lagging_subscriber():
+    broadcaster = BoardBroadcaster(max_pending=4)
+    slow = broadcaster.subscribe(1)
+    fast = broadcaster.subscribe(1)
+    for seq in range(10):
+        broadcaster.publish(1, [seq])
+        assert await fast.next() == str(seq)
+    backlog = []
+    while (message := await slow.next()) is not None:
+        backlog.append(message)
+    broadcaster.unsubscribe(slow)
+    return backlog, broadcaster.stats()
+
+
+def test_board_events_backpressure():
+    backlog, stats = asyncio.run(lagging_subscriber())
+    assert backlog == ["0", "1", "2", "3"]
+    assert stats.get("subscribers") == 1
+    assert stats.get("lagged") == 1
+
+
+async def large_commits(commits: int, size: int) -> tuple[list[str], bool]:
+    broadcaster = BoardBroadcaster(max_pending=4)
+    subscription = broadcaster.subscribe(1)
+    for commit in range(commits):
+        broadcaster.publish(1, [commit * 100 + i for i in range(size)])
+    messages = []
+    while len(messages) < commits * size and (message := await subscription.next()) is not None:
+        messages.append(message)
+    return messages, subscription.lagging
+
+
+def test_board_events_large_commit():
+    # Lag is counted in commits: one commit may have many more events than max_pending
+    messages, lagging = asyncio.run(large_commits(commits=4, size=10))
+    assert messages == [str(commit * 100 + i) for commit in range(4) for i in range(10)]
+    assert not lagging
+    messages, lagging = asyncio.run(large_commits(commits=5, size=10))
+    assert lagging
+    assert len(messages) == 40
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_events_large_put(monkeypatch):
+    monkeypatch.setattr(board_broadcaster, "max_pending", 4)
+    board = create_filled_board(1, 10)
+    for t in board.get("columns")[0].get("tasks"):
+        t["body"] = t.get("description")
+    with client.websocket_connect(f"/boards/{board.get('id')}/events",
+                                  cookies={"DxpAccessToken": pytest.token}) as socket:
+        resp = client.put(f"/boards/{board.get('id')}", json=board, cookies={"DxpAccessToken": pytest.token})
+        assert resp.status_code == 200
+        ops = [socket.receive_json().get("op") for _ in range(12)]
+    assert ops == ["board.update", "column.update"] + ["task.update"] * 10
+    assert board_broadcaster.stats().get("lagged") == 0
+    client.delete(f"/boards/{board.get('id')}", cookies={"DxpAccessToken": pytest.token})
+
+
+async def events_from_change_log(board_id: int) -> list[dict]:
+    async with AsyncSession(async_engine) as session:
+        after = await publish_logged_changes(session, None)
+    # Written by "another worker": committed before this process subscribed
+    resp = client.put(f"/boards/{board_id}", json={"title": "renamed elsewhere", "columns": []},
+                      cookies={"DxpAccessToken": pytest.token})
+    assert resp.status_code == 200
+    subscription = board_broadcaster.subscribe(board_id)
+    try:
+        async with AsyncSession(async_engine) as session:
+            last = await publish_logged_changes(session, after)
+            assert await publish_logged_changes(session, last) == last
+        messages = []
+        while subscription._pending:
+            messages.append(json.loads(await subscription.next()))
+        return messages
+    finally:
+        board_broadcaster.unsubscribe(subscription)
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_events_from_change_log():
+    board = create_filled_board(1, 0)
+    messages = asyncio.run(events_from_change_log(board.get("id")))
+    assert [m["op"] for m in messages][:1] == ["board.update"]
+    assert messages[0]["data"]["title"] == "renamed elsewhere"
+    assert messages[0]["boardId"] == board.get("id")
+    assert len({m["seq"] for m in messages}) == len(messages)
+    client.delete(f"/boards/{board.get('id')}", cookies={"DxpAccessToken": pytest.token})
+
+
+async def board_rows(board_id: int) -> list[int]:
+    async with AsyncSession(async_engine) as session:
+        columns = select(Column.id).where(Column.board_id == board_id)
+        return [
+            len((await session.exec(columns)).all()),
+            len((await session.exec(select(Task.id).where(Task.col_id.in_(columns)))).all()),
+            len((await session.exec(select(BoardChange.id).where(BoardChange.board_id == board_id))).all()),
+        ]
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_delete_cascade():
+    board = create_filled_board(3, 4)
+    first = board.get("columns")[0]
+
+    resp = client.delete(f"/boards/{board.get('id')}/columns/{first.get('id')}",
+                         cookies={"DxpAccessToken": pytest.token}
+                         )
+    assert resp.status_code == 200
+    resp = client.get(f"/tasks/{first.get('tasks')[0].get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 404
+    assert asyncio.run(board_rows(board.get("id")))[:2] == [2, 8]
+
+    resp = client.delete(f"/boards/{board.get('id') + 1000}/columns/{first.get('id')}",
+                         cookies={"DxpAccessToken": pytest.token}
+                         )
+    assert resp.status_code == 404
+
+    with count_queries() as statements:
+        resp = client.delete(f"/boards/{board.get('id')}",
+                             cookies={"DxpAccessToken": pytest.token}
+                             )
+    assert resp.status_code == 200
+    assert len([s for s in statements if s.startswith("DELETE")]) == 1
+    assert asyncio.run(board_rows(board.get("id"))) == [0, 0, 0]
+
+
+@pytest.mark.dependency(depends=["test_board_new"])
+def test_board_query_count_constant():
+    boards = {size: create_filled_board(size, size) for size in (1, 10)}
+
+    def get_board(size: int):
+        board_cache.clear()
+        return client.get(f"/boards/{boards[size].get('id')}",
+                          cookies={"DxpAccessToken": pytest.token}
+                          )
+
+    def move_tasks(size: int):
+        board = boards[size]
+        return client.post("/tasks/batch",
+                           json={"operations": [
+                               {"op": "move", "id": t.get("id"), "columnId": col.get("id")}
+                               for col in board.get("columns") for t in col.get("tasks")]},
+                           cookies={"DxpAccessToken": pytest.token}
+                           )
+
+    assert_query_count_constant(get_board)
+    assert_query_count_constant(move_tasks)
+
+    for board in boards.values():
+        client.delete(f"/boards/{board.get('id')}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..main import app
+from ..db import get_async_session
+from ..routers.auth_db import TokenStore
+
+# Every statement is slowed down to simulate a busy disk
+QUERY_DELAY = 0.02
+REQUESTS = 10
+
+
+async def setup_engine(db_path, query_threads):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+    )
+
+    def slow_query(statement):
+        query_threads.add(threading.get_ident())
+        time.sleep(QUERY_DELAY)
+
+    # The trace callback runs inside sqlite itself, i.e. on the driver thread
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_trace(dbapi_conn, conn_record):
+        dbapi_conn.driver_connection._conn.set_trace_callback(slow_query)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add(TokenStore(
+            login="ross",
+            token="concurrency",
+            exp_time=int(time.time()) + 3600
+        ))
+        await session.commit()
+    return engine
+
+
+async def run_requests(db_path):
+    query_threads = set()
+    engine = await setup_engine(db_path, query_threads)
+    loop_thread = threading.get_ident()
+
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    previous = app.dependency_overrides.get(get_async_session)
+    app.dependency_overrides[get_async_session] = get_session_override
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url="http://test",
+                cookies={"DxpAccessToken": "concurrency"}) as client:
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                resp = await client.get("/boards")
+                assert resp.status_code == 200
+            sequential = time.perf_counter() - start
+
+            start = time.perf_counter()
+            resps = await asyncio.gather(
+                *[client.get("/boards") for _ in range(REQUESTS)])
+            concurrent = time.perf_counter() - start
+            assert all(r.status_code == 200 for r in resps)
+    finally:
+        app.dependency_overrides[get_async_session] = previous
+        await engine.dispose()
+
+    return sequential, concurrent, loop_thread, query_threads
+
+
+def test_concurrent_throughput(tmp_path):
+    sequential, concurrent, loop_thread, query_threads = asyncio.run(
+        run_requests(tmp_path / "concurrency.db"))
+
+    # Queries must never run on the event loop thread
+    assert loop_thread not in query_threads
+    # Slow queries overlap instead of stalling the whole worker
+    assert concurrent * 2 < sequential
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Annotated
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .test_base import async_engine as test_engine, client
+from .. import query_stats
+from ..db import (LockRetryRoute, check_schema_version, get_async_session, sqlite_pragmas, swap_exit_stacks,
+                  use_immediate_writes, use_sqlite_pragmas)
+from ..main import app
+from ..migrations import latest_version, migrate, migrations, unique_logins
+from ..routers.auth_db import TokenStore
+
+
+def test_sqlite_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOBAN_SQLITE_CACHE_SIZE", "-1024")
+    pragmas = sqlite_pragmas("performance")
+    assert pragmas["cache_size"] == "-1024"
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    use_sqlite_pragmas(engine, pragmas)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -1024
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    engine.dispose()
+
+
+def test_query_stats(caplog, monkeypatch):
+    monkeypatch.setattr(query_stats, "slow_query_ms", 0)
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        resp = client.get("/auth/protected", cookies={"DxpAccessToken": "invalid"})
+    assert resp.status_code == 401
+    assert resp.headers["Server-Timing"].startswith("db;dur=")
+    assert resp.headers["Server-Timing"].endswith('desc="1 queries"')
+    assert any("Slow query" in r.getMessage() and "tokenstore" in r.getMessage() for r in caplog.records)
+
+    resp = client.get("/")
+    assert resp.headers["Server-Timing"].endswith('desc="0 queries"')
+
+
+async def write_while_locked(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", connect_args={"check_same_thread": False})
+    use_sqlite_pragmas(engine.sync_engine, {"journal_mode": "WAL", "busy_timeout": 50, "foreign_keys": "ON"})
+    use_immediate_writes(engine.sync_engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add(TokenStore(login="ross", token="locked", exp_time=int(time.time()) + 3600))
+        await session.commit()
+
+    # Another process holding the write lock for longer than busy_timeout
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    asyncio.get_running_loop().call_later(0.2, blocker.rollback)
+
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    previous = app.dependency_overrides.get(get_async_session)
+    app.dependency_overrides[get_async_session] = get_session_override
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                     cookies={"DxpAccessToken": "locked"}) as client:
+            resp = await client.post("/boards/new", json={"title": "locked", "columns": []})
+    finally:
+        app.dependency_overrides[get_async_session] = previous
+        blocker.close()
+        await engine.dispose()
+    return resp
+
+
+def test_lock_retry(tmp_path, caplog):
+    with caplog.at_level(logging.INFO, logger="app.db"):
+        resp = asyncio.run(write_while_locked(str(tmp_path / "locked.db")))
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["title"] == "locked"
+    assert any("Database locked, retrying POST /boards/new" in r.getMessage() for r in caplog.records)
+
+
+def test_fastapi_exit_stacks():
+    # LockRetryRoute swaps exit stacks FastAPI keeps in private scope keys, an upgrade may move them
+    cleaned_up = []
+
+    async def resource():
+        yield "resource"
+        cleaned_up.append(True)
+
+    router = APIRouter(route_class=LockRetryRoute)
+
+    @router.post("/")
+    async def write(value: Annotated[str, Depends(resource)]):
+        return value
+
+    probe = FastAPI()
+    probe.include_router(router)
+    resp = TestClient(probe).post("/")
+    assert resp.status_code == 200, resp.text
+    assert cleaned_up == [True]
+
+    with pytest.raises(RuntimeError, match="FastAPI version"):
+        swap_exit_stacks({}, ())
+
+
+async def write_during_slow_upload() -> tuple[httpx.Response, httpx.Response, float]:
+    async with AsyncSession(test_engine) as session:
+        session.add(TokenStore(login="ross", token="upload", exp_time=int(time.time()) + 3600))
+        await session.commit()
+
+    async def slow_body():
+        yield b'{"title": "slow upload", '
+        await asyncio.sleep(1)
+        yield b'"columns": []}'
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                 cookies={"DxpAccessToken": "upload"}) as client:
+        slow = asyncio.create_task(client.post("/boards/new", content=slow_body(),
+                                               headers={"Content-Type": "application/json"}))
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        fast = await client.post("/boards/new", json={"title": "fast", "columns": []})
+        elapsed = time.perf_counter() - start
+        responses = [await slow, fast]
+        for resp in responses:
+            await client.delete(f"/boards/{resp.json()['id']}")
+    return *responses, elapsed
+
+
+def test_write_lock_after_body():
+    slow, fast, elapsed = asyncio.run(write_during_slow_upload())
+    assert slow.status_code == fast.status_code == 200
+    # The upload still running doesn't hold the write lock
+    assert elapsed < 0.5
+
+
+def schema(db_path) -> dict:
+    """
+    The columns, indexes, foreign keys and triggers of each table, however the table was written.
+    """
+    conn = sqlite3.connect(db_path)
+    tables = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT IN ('schema_version', 'sqlite_sequence')")]
+    result = {}
+    for table in tables:
+        result[table] = {
+            "columns": {row[1:4] + row[5:] for row in conn.execute(f'PRAGMA table_info("{table}")')},
+            "indexes": {(name, unique, tuple(col for *_, col in conn.execute(f'PRAGMA index_info("{name}")')))
+                        for _, name, unique, origin, _ in conn.execute(f'PRAGMA index_list("{table}")')
+                        if origin == "c"},
+            "foreign_keys": {(row[2], row[3], row[4], row[6])
+                             for row in conn.execute(f'PRAGMA foreign_key_list("{table}")')},
+            "triggers": {" ".join(sql.split()) for (sql,) in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))},
+        }
+    conn.close()
+    return result
+
+
+def test_migrations(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    expected = schema(tmp_path / "models.db")
+
+    assert migrate(str(tmp_path / "new.db")) == list(range(1, latest_version + 1))
+    assert migrate(str(tmp_path / "new.db")) == []
+    assert schema(tmp_path / "new.db") == expected
+
+    # Tables created by the first release, before the migrations
+    old = sqlite3.connect(tmp_path / "old.db")
+    migrate(str(tmp_path / "old.db"), target=1)
+    old.execute("DROP TABLE schema_version")
+    old.execute("INSERT INTO user VALUES (1, 'Ross', 'Geller', 'ross', ?, 'salt')", ("0" * 64,))
+    old.execute("INSERT INTO tokenstore VALUES (1, 'ross', 'token', '2030-01-01T12:00:00.500000')")
+    old.execute("INSERT INTO board VALUES (1, 'Board')")
+    old.execute("INSERT INTO \"column\" VALUES (1, 1, 'Todo', 0)")
+    old.executemany("INSERT INTO task VALUES (?, ?, 'body', ?, 1)", [(1, "second", 1), (2, "first", 0)])
+    old.commit()
+    old.close()
+
+    migrate(str(tmp_path / "old.db"))
+    assert schema(tmp_path / "old.db") == expected
+    conn = sqlite3.connect(tmp_path / "old.db")
+    exp_time = conn.execute("SELECT exp_time FROM tokenstore").fetchone()[0]
+    assert exp_time == int(time.mktime((2030, 1, 1, 12, 0, 0, 0, 0, -1)))
+    assert conn.execute("SELECT title FROM task ORDER BY rank").fetchall() == [("first",), ("second",)]
+    assert conn.execute("SELECT value FROM counter WHERE name = 'board_version'").fetchone() == (0,)
+    assert conn.execute("SELECT rowid FROM task_fts WHERE task_fts MATCH 'second'").fetchall() == [(1,)]
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("DELETE FROM board")
+    assert conn.execute("SELECT count(*) FROM task").fetchone()[0] == 0
+    conn.close()
+
+
+def test_unique_logins_migration(tmp_path):
+    migrate(str(tmp_path / "users.db"), target=migrations.index(unique_logins))
+    conn = sqlite3.connect(tmp_path / "users.db")
+    conn.executemany("INSERT INTO user VALUES (?, 'Joey', 'Tribbiani', 'joey', 'hash', 'salt')", [(1,), (2,)])
+    conn.commit()
+    conn.close()
+    with pytest.raises(RuntimeError, match="joey"):
+        migrate(str(tmp_path / "users.db"))
+
+
+def test_schema_version_check(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'check.db'}")
+    with pytest.raises(RuntimeError, match="run python -m app.migrations"):
+        check_schema_version(engine)
+    migrate(str(tmp_path / "check.db"), target=latest_version - 1)
+    with pytest.raises(RuntimeError, match=f"version {latest_version - 1} is older"):
+        check_schema_version(engine)
+    migrate(str(tmp_path / "check.db"))
+    check_schema_version(engine)
@@ -1,5 +1,13 @@
+import asyncio
+import pstats
+
+import httpx
+
 import pytest
+from fastapi.testclient import TestClient
 
+from ..main import app
+from ..profiling import ProfilingMiddleware
 from .test_base import client
 
 
@@ -8,3 +16,71 @@ def test_api():
     resp = client.get("/")
     assert resp.status_code == 200
     assert resp.text == 'Hello from Joban API'
+
+
+def test_metrics():
+    client.get("/")
+    client.get("/boards/1", cookies={"DxpAccessToken": "invalid"})
+    client.get("/no/such/route")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    lines = resp.text.splitlines()
+    assert any(line.startswith('joban_http_requests_total{method="GET",route="/",status="200"}') for line in lines)
+    assert any(line.startswith('joban_http_requests_total{method="GET",route="/boards/{board_id}",status="401"}')
+               for line in lines)
+    assert any(line.startswith('joban_http_requests_total{method="GET",route="<unmatched>",status="404"}')
+               for line in lines)
+    assert 'joban_http_request_duration_seconds_bucket{method="GET",route="/",le="+Inf"}' in resp.text
+    assert 'joban_http_response_size_bytes_sum{method="GET",route="/"} ' in resp.text
+    assert 'joban_http_requests_in_flight{method="GET"} 1' in resp.text
+    for name in ["joban_token_cache_hits", "joban_board_cache_size_bytes", "joban_board_events_subscribers",
+                 "joban_db_pool_checked_out"]:
+        assert any(line.startswith(name + " ") for line in lines)
+
+
+def test_profiling(tmp_path):
+    profiled = TestClient(ProfilingMiddleware(app, directory=str(tmp_path), key="secret"),
+                          cookies={"DxpAccessToken": pytest.token})
+
+    resp = profiled.get("/boards", headers={"X-Profile": "sample"})
+    assert resp.status_code == 200
+    assert "x-profile-report" not in resp.headers
+
+    resp = profiled.get("/boards", headers={"X-Profile": "sample:secret"})
+    assert resp.status_code == 200
+    report = tmp_path / resp.headers["x-profile-report"]
+    assert report.suffix == ".folded"
+    for line in report.read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+    resp = profiled.get("/boards", headers={"X-Profile": "cprofile:secret"})
+    assert resp.status_code == 200
+    stats = pstats.Stats(str(tmp_path / resp.headers["x-profile-report"]))
+    assert any(name == "get_boards_list" for _, _, name in stats.stats)
+
+
+async def slow_app(scope, receive, send):
+    await asyncio.sleep(0.1)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"done"})
+
+
+async def profiled_requests(directory: str, count: int) -> list[httpx.Response]:
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(slow_app, directory=directory, key=""))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as profiled:
+        return await asyncio.gather(*[profiled.get("/", headers={"X-Profile": "cprofile"}) for _ in range(count)])
+
+
+def test_profiling_overlap(tmp_path):
+    responses = asyncio.run(profiled_requests(str(tmp_path), 2))
+    assert [resp.status_code for resp in responses] == [200, 200]
+    reported = [resp for resp in responses if "x-profile-report" in resp.headers]
+    skipped = [resp for resp in responses if resp.headers.get("x-profile-skipped") == "busy"]
+    assert len(reported) == 1 and len(skipped) == 1
+    assert (tmp_path / reported[0].headers["x-profile-report"]).exists()
+
+    # The session is over, the next request is profiled again
+    assert "x-profile-report" in asyncio.run(profiled_requests(str(tmp_path), 1))[0].headers
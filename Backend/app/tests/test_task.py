@@ -1,4 +1,11 @@
-from .test_base import client
+import asyncio
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .test_base import async_engine, client, count_queries
+from ..routers.boards_db import Task
+from ..routers.boards_utils import rank_between, rank_for_ordinal
 
 import pytest
 
@@ -102,3 +109,301 @@ def test_task_put():
                       },
                       cookies={"DxpAccessToken": pytest.token})
     assert resp.status_code == 404
+
+
+def column_titles(board_id: int) -> list:
+    resp = client.get(f"/boards/{board_id}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    return [[t.get("title") for t in col.get("tasks")] for col in resp.json().get("columns")]
+
+
+@pytest.mark.dependency(depends=["test_task_new"])
+def test_task_move():
+    board_id = client.post("/boards/new",
+                           json={
+                               "title": "move board",
+                               "columns": [
+                                   {"title": "first", "orderNumber": 0},
+                                   {"title": "second", "orderNumber": 1}
+                               ]
+                           },
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).json().get("id")
+    columns = client.get(f"/boards/{board_id}",
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json().get("columns")
+    first, second = columns[0].get("id"), columns[1].get("id")
+    for title in ["a", "b", "c"]:
+        client.post("/tasks/new",
+                    json={"title": title, "description": "", "columnId": first},
+                    cookies={"DxpAccessToken": pytest.token}
+                    )
+    ids = {t.get("title"): t.get("id") for t in client.get(
+        f"/boards/{board_id}", cookies={"DxpAccessToken": pytest.token}
+    ).json().get("columns")[0].get("tasks")}
+
+    with count_queries() as statements:
+        resp = client.post(f"/tasks/{ids['c']}/move",
+                           json={"columnId": first, "beforeId": ids["a"]},
+                           cookies={"DxpAccessToken": pytest.token}
+                           )
+    assert resp.status_code == 200
+    assert len([s for s in statements if s.startswith("UPDATE task")]) == 1
+    assert column_titles(board_id) == [["c", "a", "b"], []]
+
+    client.post(f"/tasks/{ids['a']}/move",
+                json={"columnId": second},
+                cookies={"DxpAccessToken": pytest.token}
+                )
+    client.post(f"/tasks/{ids['c']}/move",
+                json={"columnId": first, "afterId": ids["b"]},
+                cookies={"DxpAccessToken": pytest.token}
+                )
+    assert column_titles(board_id) == [["b", "c"], ["a"]]
+
+    # Squeezing into the same gap over and over grows the rank until it is rebalanced
+    for _ in range(40):
+        client.post(f"/tasks/{ids['c']}/move",
+                    json={"columnId": first, "beforeId": ids["b"]},
+                    cookies={"DxpAccessToken": pytest.token}
+                    )
+        client.post(f"/tasks/{ids['b']}/move",
+                    json={"columnId": first, "beforeId": ids["c"]},
+                    cookies={"DxpAccessToken": pytest.token}
+                    )
+    assert column_titles(board_id) == [["b", "c"], ["a"]]
+
+    resp = client.post(f"/tasks/{ids['c']}/move",
+                       json={"columnId": second, "beforeId": ids["b"]},
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    assert resp.status_code == 404
+
+    resp = client.post(f"/boards/{board_id}/columns/{second}/move",
+                       json={"beforeId": first},
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    assert resp.status_code == 200
+    assert column_titles(board_id) == [["a"], ["b", "c"]]
+
+    # Moving an item relative to itself fails like it does in a batch
+    for path, anchor in ((f"/boards/{board_id}/columns/{second}/move", second),
+                         (f"/tasks/{ids['c']}/move", ids["c"])):
+        for key in ("beforeId", "afterId"):
+            resp = client.post(path, json={"columnId": second, key: anchor},
+                               cookies={"DxpAccessToken": pytest.token}
+                               )
+            assert resp.status_code == 404
+    resp = client.post("/tasks/batch",
+                       json={"operations": [{"op": "move", "id": ids["c"], "columnId": second,
+                                             "beforeId": ids["c"]}]},
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    assert resp.json().get("results")[0].get("status") == 404
+    assert column_titles(board_id) == [["a"], ["b", "c"]]
+
+    client.delete(f"/boards/{board_id}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+def add_task_queries(column_id: int) -> int:
+    with count_queries() as statements:
+        resp = client.post("/tasks/new",
+                           json={"title": "append", "description": "", "columnId": column_id},
+                           cookies={"DxpAccessToken": pytest.token}
+                           )
+    assert resp.status_code == 200
+    return len(statements)
+
+
+async def column_ranks(column_id: int) -> list[str]:
+    async with AsyncSession(async_engine) as session:
+        return list((await session.exec(select(Task.rank).where(Task.col_id == column_id))).all())
+
+
+def test_rank_between_append():
+    rank = None
+    for _ in range(1000):
+        previous, rank = rank, rank_between(rank, None)
+        assert previous is None or rank > previous
+    assert len(rank) == len(rank_for_ordinal(0))
+    assert rank_between("V0001VVVVV", None) == "V0002V"
+    assert rank_between("zzzzzz", None) > "zzzzzz"
+
+
+@pytest.mark.dependency(depends=["test_task_new"])
+def test_task_append():
+    board_id = client.post("/boards/new",
+                           json={"title": "append board",
+                                 "columns": [{"title": "column", "orderNumber": 0}]},
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).json().get("id")
+    column_id = client.get(f"/boards/{board_id}",
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).json().get("columns")[0].get("id")
+
+    empty = add_task_queries(column_id)
+    for _ in range(30):
+        add_task_queries(column_id)
+    assert add_task_queries(column_id) == empty
+
+    tasks = client.get(f"/boards/{board_id}",
+                       cookies={"DxpAccessToken": pytest.token}
+                       ).json().get("columns")[0].get("tasks")
+    assert [t.get("orderNumber") for t in tasks] == list(range(32))
+    # Appending increments the last rank instead of making it longer
+    assert {len(rank) for rank in asyncio.run(column_ranks(column_id))} == {len(rank_for_ordinal(0))}
+
+    # The last task moved to the front no longer has the highest order number of the last ranked task
+    resp = client.post(f"/tasks/{tasks[-1].get('id')}/move",
+                       json={"columnId": column_id, "beforeId": tasks[0].get("id")},
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    assert resp.status_code == 200
+    add_task_queries(column_id)
+    tasks = client.get(f"/boards/{board_id}",
+                       cookies={"DxpAccessToken": pytest.token}
+                       ).json().get("columns")[0].get("tasks")
+    assert tasks[-1].get("orderNumber") == 32
+    assert len({t.get("orderNumber") for t in tasks}) == len(tasks)
+
+    resp = client.post("/tasks/new",
+                       json={"title": "lost", "description": "", "columnId": 100000},
+                       cookies={"DxpAccessToken": pytest.token}
+                       )
+    assert resp.status_code == 404
+
+    client.delete(f"/boards/{board_id}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+def batch_tasks(operations: list) -> tuple[int, dict, int]:
+    with count_queries() as statements:
+        resp = client.post("/tasks/batch",
+                           json={"operations": operations},
+                           cookies={"DxpAccessToken": pytest.token}
+                           )
+    return resp.status_code, resp.json(), len(statements)
+
+
+@pytest.mark.dependency(depends=["test_task_new"])
+def test_task_batch():
+    board_id = client.post("/boards/new",
+                           json={
+                               "title": "batch board",
+                               "columns": [
+                                   {"title": "first", "orderNumber": 0},
+                                   {"title": "second", "orderNumber": 1}
+                               ]
+                           },
+                           cookies={"DxpAccessToken": pytest.token}
+                           ).json().get("id")
+    columns = client.get(f"/boards/{board_id}",
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json().get("columns")
+    first, second = columns[0].get("id"), columns[1].get("id")
+
+    status, resp, small = batch_tasks([
+        {"op": "create", "title": title, "description": "", "columnId": first} for title in ["a", "b"]])
+    assert status == 200
+    assert resp.get("applied") is True
+    ids = {"a": resp.get("results")[0].get("id"), "b": resp.get("results")[1].get("id")}
+
+    status, resp, large = batch_tasks([
+        {"op": "create", "title": str(i), "description": "", "columnId": second} for i in range(20)])
+    assert status == 200
+    assert large == small
+    assert column_titles(board_id) == [["a", "b"], [str(i) for i in range(20)]]
+
+    status, resp, _ = batch_tasks([
+        {"op": "move", "id": ids["b"], "columnId": first, "beforeId": ids["a"]},
+        {"op": "update", "id": ids["a"], "title": "a2", "description": "changed", "columnId": first},
+        {"op": "create", "title": "c", "description": "", "columnId": first},
+        {"op": "move", "id": ids["a"], "columnId": second},
+    ] + [{"op": "delete", "id": t.get("id")} for t in client.get(
+        f"/boards/{board_id}", cookies={"DxpAccessToken": pytest.token}
+    ).json().get("columns")[1].get("tasks")])
+    assert status == 200
+    assert [r.get("status") for r in resp.get("results")] == [200] * 24
+    assert column_titles(board_id) == [["b", "c"], ["a2"]]
+
+    changes = client.get(f"/boards/{board_id}/changes",
+                         cookies={"DxpAccessToken": pytest.token}
+                         ).json().get("changes")
+    assert [c.get("op") for c in changes[-24:-20]] == ["task.move", "task.update", "task.create", "task.move"]
+
+    status, resp, _ = batch_tasks([
+        {"op": "delete", "id": ids["b"]},
+        {"op": "update", "id": ids["b"], "title": "gone", "description": "", "columnId": first},
+        {"op": "create", "title": "lost", "description": "", "columnId": 100000},
+    ])
+    assert status == 409
+    assert resp.get("applied") is False
+    assert [r.get("status") for r in resp.get("results")] == [424, 404, 404]
+    assert column_titles(board_id) == [["b", "c"], ["a2"]]
+
+    client.delete(f"/boards/{board_id}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+
+
+def search_tasks(q: str, **params) -> tuple[list, str | None]:
+    resp = client.get("/tasks/search",
+                      params={"q": q, **params},
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert resp.status_code == 200
+    return resp.json(), resp.headers.get("X-Next-Cursor")
+
+
+@pytest.mark.dependency(depends=["test_task_new"])
+def test_task_search():
+    board_ids = []
+    for title in ["search board", "other board"]:
+        board_ids.append(client.post("/boards/new",
+                                     json={"title": title, "columns": [{"title": "column", "orderNumber": 0}]},
+                                     cookies={"DxpAccessToken": pytest.token}
+                                     ).json().get("id"))
+    column_ids = [client.get(f"/boards/{board_id}",
+                             cookies={"DxpAccessToken": pytest.token}
+                             ).json().get("columns")[0].get("id") for board_id in board_ids]
+    status, resp, _ = batch_tasks([
+        {"op": "create", "title": "Fix login", "description": "Token expires too early", "columnId": column_ids[0]},
+        {"op": "create", "title": "Docs", "description": "Explain the login flow", "columnId": column_ids[0]},
+        {"op": "create", "title": "Logo", "description": "New colors", "columnId": column_ids[0]},
+        {"op": "create", "title": "Login page", "description": "", "columnId": column_ids[1]},
+    ])
+    ids = [r.get("id") for r in resp.get("results")]
+
+    hits, cursor = search_tasks("login", board_id=board_ids[0])
+    assert [h.get("id") for h in hits] == [ids[0], ids[1]]
+    assert hits[0].get("snippet") == "Fix **login**"
+    assert hits[1].get("boardId") == board_ids[0]
+    assert cursor is None
+
+    hits, cursor = search_tasks("lo", board_id=board_ids[0], limit=2)
+    assert len(hits) == 2 and cursor == "2"
+    hits, cursor = search_tasks("lo", board_id=board_ids[0], limit=2, offset=2)
+    assert len(hits) == 1 and cursor is None
+
+    assert {h.get("id") for h in search_tasks("login")[0]} >= {ids[0], ids[1], ids[3]}
+    assert search_tasks('login" OR "logo')[0] == []
+
+    client.put(f"/tasks/{ids[2]}",
+               json={"title": "Login logo", "description": "", "columnId": column_ids[0]},
+               cookies={"DxpAccessToken": pytest.token}
+               )
+    client.delete(f"/tasks/{ids[0]}",
+                  cookies={"DxpAccessToken": pytest.token}
+                  )
+    hits, _ = search_tasks("login", board_id=board_ids[0])
+    assert [h.get("id") for h in hits] == [ids[2], ids[1]]
+
+    for board_id in board_ids:
+        client.delete(f"/boards/{board_id}",
+                      cookies={"DxpAccessToken": pytest.token}
+                      )
+    assert search_tasks("login")[0] == []
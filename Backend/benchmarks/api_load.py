@@ -0,0 +1,314 @@
+"""
+Load and latency benchmark for the HTTP endpoints of auth.py and boards.py.
+
+Every scenario sends --requests requests to one endpoint at each --concurrency level
+and reports throughput with p50/p95/p99 latency. Requests go through httpx.ASGITransport
+into the app in this process, against a database seeded with many boards, wide columns,
+thousands of tasks and many live tokens. The engine is set up like the app's, with the
+configured pragma profile and BEGIN IMMEDIATE writes (app.db.configure_engine). "file" is
+a temporary database file, "memory" the same on tmpfs (/dev/shm) where available. The
+WebSocket event stream is not driven, httpx has no WebSocket client.
+
+Run from the Backend directory:
+
+    python -m benchmarks.api_load --save benchmarks/baselines/api_load.json
+    python -m benchmarks.api_load --compare benchmarks/baselines/api_load.json
+
+With --compare, scenarios whose p99 grew or whose throughput dropped by more than
+--tolerance, or which failed more requests than in the baseline, are reported and the
+exit status is 1.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, insert, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import configure_engine, connect_args, get_async_session
+from app.main import app
+from app.routers.auth_db import TokenStore, User
+from app.routers.auth_passwords import password_hasher
+from app.routers.boards import board_version_counter
+from app.routers.boards_db import Board, Column, Counter, Task
+from app.routers.boards_utils import rank_for_ordinal
+from benchmarks.sqlite_profiles import percentile
+
+words = ["login", "board", "column", "deploy", "review", "design", "bug", "docs", "release", "search",
+         "cache", "token", "sync", "mobile", "layout", "export", "import", "billing", "alert", "report"]
+unique = itertools.count()
+
+
+def database_dir(db: str) -> str | None:
+    # A shared in-memory connection like the tests use can't take concurrent transactions,
+    # so "memory" is a database file on tmpfs: no disk and no fsync, but separate connections
+    if db == "memory" and Path("/dev/shm").is_dir():
+        return "/dev/shm"
+    return None
+
+
+def text(rnd: random.Random, n: int) -> str:
+    return " ".join(rnd.choice(words) for _ in range(n))
+
+
+async def seed(engine, args) -> dict:
+    """
+    Fills the database with bulk inserts and returns the IDs the scenarios pick from.
+    """
+    rnd = random.Random(1)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        await session.exec(insert(User), params=[{
+            "first_name": "bench", "last_name": "user", "login": "bench", "salt": "benchsalt",
+            "password_hash": password_hasher._scrypt("1234", "benchsalt", password_hasher.n,
+                                                     password_hasher.r, password_hasher.p)}])
+        await session.exec(insert(TokenStore), params=[
+            {"login": "bench", "token": f"bench{i}", "exp_time": int(time.time()) + 86400}
+            for i in range(args.tokens)])
+        await session.exec(insert(Board), params=[
+            {"title": f"board {b}", "version": b + 1} for b in range(args.boards)])
+        # The migrated databases of worker_scaling and cold_start already have the row
+        await session.exec(insert(Counter).prefix_with("OR REPLACE"),
+                           params=[{"name": board_version_counter, "value": args.boards}])
+        board_ids = (await session.exec(select(Board.id))).all()
+        await session.exec(insert(Column), params=[
+            {"board_id": board_id, "title": f"column {c}", "ord_num": c, "rank": rank_for_ordinal(c)}
+            for board_id in board_ids for c in range(args.columns)])
+        columns = (await session.exec(select(Column.id, Column.board_id))).all()
+        await session.exec(insert(Task), params=[
+            {"col_id": col_id, "title": text(rnd, 2), "body": text(rnd, 30), "ord_num": t,
+             "rank": rank_for_ordinal(t)}
+            for col_id, _ in columns for t in range(args.tasks)])
+        tasks = (await session.exec(select(Task.id, Task.col_id))).all()
+        await session.commit()
+    return {
+        "cookies": {"DxpAccessToken": "bench0"},
+        "boards": list(board_ids),
+        "columns": [tuple(c) for c in columns],
+        "tasks": [tuple(t) for t in tasks],
+    }
+
+
+def pick_task(ctx: dict) -> tuple[int, int]:
+    return random.choice(ctx["tasks"])
+
+
+async def board_patch(client: httpx.AsyncClient, ctx: dict, board_id: int) -> dict:
+    board = (await client.get(f"/boards/{board_id}", cookies=ctx["cookies"])).json()
+    return {"title": board["title"], "columns": [{
+        "id": col["id"], "title": col["title"], "orderNumber": col["orderNumber"],
+        "tasks": [{"id": t["id"], "title": t["title"][:20], "orderNumber": t["orderNumber"],
+                   "body": t["description"]} for t in col["tasks"]]} for col in board["columns"]]}
+
+
+async def new_boards(client: httpx.AsyncClient, ctx: dict, n: int) -> list:
+    return [(await client.post("/boards/new", json={
+        "title": "doomed", "columns": [{"title": "column", "orderNumber": 0}]},
+        cookies=ctx["cookies"])).json()["id"] for _ in range(n)]
+
+
+async def new_columns(client: httpx.AsyncClient, ctx: dict, n: int) -> list:
+    board_id = (await client.post("/boards/new", json={
+        "title": "doomed", "columns": [{"title": f"column {i}", "orderNumber": i} for i in range(n)]},
+        cookies=ctx["cookies"])).json()["id"]
+    board = (await client.get(f"/boards/{board_id}", cookies=ctx["cookies"])).json()
+    return [(board_id, col["id"]) for col in board["columns"]]
+
+
+async def new_tasks(client: httpx.AsyncClient, ctx: dict, n: int) -> list:
+    col_id = random.choice(ctx["columns"])[0]
+    resp = await client.post("/tasks/batch", json={"operations": [
+        {"op": "create", "title": "doomed", "description": "", "columnId": col_id} for _ in range(n)]},
+        cookies=ctx["cookies"])
+    return [r["id"] for r in resp.json()["results"]]
+
+
+async def spare_tokens(client: httpx.AsyncClient, ctx: dict, n: int) -> list:
+    # Seeded token 0 is used by every other scenario, logout gets the rest
+    return [{"DxpAccessToken": f"bench{next(ctx['spare_tokens'])}"} for _ in range(n)]
+
+
+def board_get_etag(client, ctx, _):
+    board_id = random.choice(ctx["boards"])
+    return client.get(f"/boards/{board_id}", cookies=ctx["cookies"],
+                      headers={"If-None-Match": ctx["etags"].get(board_id, "")})
+
+
+def task_move(client, ctx, _):
+    task_id, col_id = pick_task(ctx)
+    return client.post(f"/tasks/{task_id}/move", json={"columnId": col_id}, cookies=ctx["cookies"])
+
+
+def task_batch(client, ctx, _):
+    operations = []
+    for _ in range(10):
+        task_id, col_id = pick_task(ctx)
+        operations.append({"op": "update", "id": task_id, "title": random.choice(words),
+                           "description": text(random, 30), "columnId": col_id})
+    return client.post("/tasks/batch", json={"operations": operations}, cookies=ctx["cookies"])
+
+
+scenarios = {
+    "auth.register": (None, lambda client, ctx, _: client.post("/auth/register", json={
+        "first_name": "load", "last_name": "test", "login": f"load{next(unique)}", "password": "1234"})),
+    "auth.login": (None, lambda client, ctx, _: client.post(
+        "/auth/login", json={"login": "bench", "password": "1234"})),
+    "auth.whoami": (None, lambda client, ctx, _: client.get("/auth/whoami", cookies=ctx["cookies"])),
+    "auth.protected": (None, lambda client, ctx, _: client.get("/auth/protected", cookies=ctx["cookies"])),
+    "auth.cache": (None, lambda client, ctx, _: client.get("/auth/cache", cookies=ctx["cookies"])),
+    "auth.logout": (spare_tokens, lambda client, ctx, cookies: client.post("/auth/logout", cookies=cookies)),
+    "boards.new": (None, lambda client, ctx, _: client.post("/boards/new", json={
+        "title": "load", "columns": [{"title": f"column {i}", "orderNumber": i} for i in range(5)]},
+        cookies=ctx["cookies"])),
+    "boards.list": (None, lambda client, ctx, _: client.get("/boards", cookies=ctx["cookies"])),
+    "boards.cache": (None, lambda client, ctx, _: client.get("/boards/cache", cookies=ctx["cookies"])),
+    "boards.get": (None, lambda client, ctx, _: client.get(
+        f"/boards/{random.choice(ctx['boards'])}", cookies=ctx["cookies"])),
+    "boards.get_etag": (None, board_get_etag),
+    "boards.changes": (None, lambda client, ctx, _: client.get(
+        f"/boards/{random.choice(ctx['boards'])}/changes", cookies=ctx["cookies"])),
+    "boards.put": (None, lambda client, ctx, _: client.put(
+        f"/boards/{ctx['boards'][0]}", json=ctx["patch"], cookies=ctx["cookies"])),
+    "boards.delete": (new_boards, lambda client, ctx, board_id: client.delete(
+        f"/boards/{board_id}", cookies=ctx["cookies"])),
+    "columns.move": (None, lambda client, ctx, _: client.post(
+        "/boards/{1}/columns/{0}/move".format(*random.choice(ctx["columns"])), json={}, cookies=ctx["cookies"])),
+    "columns.delete": (new_columns, lambda client, ctx, ids: client.delete(
+        "/boards/{0}/columns/{1}".format(*ids), cookies=ctx["cookies"])),
+    "tasks.new": (None, lambda client, ctx, _: client.post("/tasks/new", json={
+        "title": random.choice(words), "description": text(random, 30),
+        "columnId": random.choice(ctx["columns"])[0]}, cookies=ctx["cookies"])),
+    "tasks.get": (None, lambda client, ctx, _: client.get(
+        f"/tasks/{pick_task(ctx)[0]}", cookies=ctx["cookies"])),
+    "tasks.put": (None, lambda client, ctx, _: client.put("/tasks/{0}".format(pick_task(ctx)[0]), json={
+        "title": random.choice(words), "description": text(random, 30),
+        "columnId": random.choice(ctx["columns"])[0]}, cookies=ctx["cookies"])),
+    "tasks.delete": (new_tasks, lambda client, ctx, task_id: client.delete(
+        f"/tasks/{task_id}", cookies=ctx["cookies"])),
+    "tasks.move": (None, task_move),
+    "tasks.batch": (None, task_batch),
+    "tasks.search": (None, lambda client, ctx, _: client.get("/tasks/search", params={
+        "q": random.choice(words), "board_id": random.choice(ctx["boards"])}, cookies=ctx["cookies"])),
+}
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: dict, name: str, concurrency: int, requests: int) -> dict:
+    prepare, request = scenarios[name]
+    args = await prepare(client, ctx, requests) if prepare else [None] * requests
+    queue = iter(args)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for arg in queue:
+            start = time.perf_counter()
+            resp = await request(client, ctx, arg)
+            latencies.append(time.perf_counter() - start)
+            errors += resp.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "req/s": len(latencies) / elapsed,
+        "p50 ms": percentile(latencies, 50) * 1000,
+        "p95 ms": percentile(latencies, 95) * 1000,
+        "p99 ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+
+async def run_db(db: str, args) -> list[dict]:
+    with tempfile.TemporaryDirectory(dir=database_dir(db)) as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}", connect_args=connect_args)
+        # The write path of the app: BEGIN IMMEDIATE, which takes over the write lock of LockRetryRoute
+        configure_engine(engine.sync_engine)
+        ctx = await seed(engine, args)
+        ctx["spare_tokens"] = iter(range(1, args.tokens))
+
+        async def get_bench_session():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = get_bench_session
+        results = []
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench") as client:
+            ctx["patch"] = await board_patch(client, ctx, ctx["boards"][0])
+            ctx["etags"] = {board_id: (await client.get(f"/boards/{board_id}", cookies=ctx["cookies"]))
+                            .headers["ETag"] for board_id in ctx["boards"]}
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_scenario(client, ctx, name, concurrency, args.requests)
+                    results.append({"db": db, "scenario": name, "concurrency": concurrency, **result})
+                    print_row(results[-1])
+        app.dependency_overrides.pop(get_async_session)
+        await engine.dispose()
+    return results
+
+
+columns = ["db", "scenario", "concurrency", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors"]
+
+
+def print_row(row: dict, note: str = ""):
+    print("  ".join(f"{row[k]:>10.1f}" if isinstance(row[k], float) else f"{row[k]:>16}"
+                    if k == "scenario" else f"{row[k]:>10}" for k in columns) + note, flush=True)
+
+
+def compare(results: list[dict], baseline_path: str, tolerance: float) -> int:
+    """
+    Prints the scenarios which regressed against the baseline and returns how many did.
+    """
+    baseline = {(r["db"], r["scenario"], r["concurrency"]): r for r in json.loads(Path(baseline_path).read_text())}
+    regressions = 0
+    print(f"\nCompared with {baseline_path}, tolerance {tolerance:.0%}:")
+    for row in results:
+        old = baseline.get((row["db"], row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        p99 = row["p99 ms"] / max(old["p99 ms"], 1e-9) - 1
+        rps = row["req/s"] / max(old["req/s"], 1e-9) - 1
+        errors = row["errors"] - old["errors"]
+        if p99 > tolerance or rps < -tolerance / (1 + tolerance) or errors > 0:
+            regressions += 1
+            print_row(row, f"  p99 {p99:+.0%}, req/s {rps:+.0%}, errors {errors:+d}  REGRESSION")
+    print(f"{regressions} regression(s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dbs", nargs="+", default=["memory", "file"])
+    parser.add_argument("--scenarios", nargs="+", default=list(scenarios))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--boards", type=int, default=50)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--save", help="write the results to this JSON file as the new baseline")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print("  ".join(f"{k:>16}" if k == "scenario" else f"{k:>10}" for k in columns))
+    results = []
+    for db in args.dbs:
+        results += asyncio.run(run_db(db, args))
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(results, indent=1))
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares deleting a big board through the ORM cascade with a single cascading DELETE.
+
+"orm" is the old path: the board is loaded with all of its columns and tasks and the
+session deletes them row by row. "cascade" is del_board: one DELETE of the board row,
+the database removes the rest through ON DELETE CASCADE. Each run seeds a fresh file
+database with the performance pragma profile.
+
+Run from the Backend directory:
+
+    python -m benchmarks.board_delete --columns 10 --tasks 5000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, SQLModel, create_engine, delete, insert, select
+
+from app.db import sqlite_profiles, use_sqlite_pragmas
+from app.routers.boards_db import Board, Column, Task
+
+
+def seed(engine, columns: int, tasks: int) -> int:
+    with Session(engine) as session:
+        board = Board(title="big board", columns=[
+            Column(title=f"column {c}", ord_num=c) for c in range(columns)])
+        session.add(board)
+        session.flush()
+        session.exec(insert(Task), params=[
+            {"title": f"task {t}", "body": "body " * 20, "ord_num": t, "col_id": col.id}
+            for col in board.columns for t in range(tasks)])
+        session.commit()
+        return board.id
+
+
+def delete_orm(session: Session, board_id: int):
+    board = session.get(Board, board_id, options=[selectinload(Board.columns).selectinload(Column.tasks)])
+    session.delete(board)
+    session.commit()
+
+
+def delete_cascade(session: Session, board_id: int):
+    session.exec(delete(Board).where(Board.id == board_id))
+    session.commit()
+
+
+def run(mode: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        use_sqlite_pragmas(engine, sqlite_profiles["performance"])
+        SQLModel.metadata.create_all(engine)
+        board_id = seed(engine, args.columns, args.tasks)
+
+        with Session(engine) as session:
+            tracemalloc.start()
+            start = time.perf_counter()
+            {"orm": delete_orm, "cascade": delete_cascade}[mode](session, board_id)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            left = session.exec(select(func.count(Task.id))).one()
+        engine.dispose()
+
+    return {
+        "mode": mode,
+        "tasks": args.columns * args.tasks,
+        "delete ms": elapsed * 1000,
+        "peak MiB": peak / 2 ** 20,
+        "tasks left": left,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", default=["orm", "cascade"])
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = [run(mode, args) for mode in args.modes]
+    keys = list(results[0])
+    print("  ".join(f"{k:>14}" for k in keys))
+    for r in results:
+        print("  ".join(f"{v:>14.1f}" if isinstance(v, float) else f"{v:>14}"
+                        for v in r.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares encoding time of GET /boards/{board_id} bodies against board size.
+
+"generic" is the old path: nested camelCase dicts passed through jsonable_encoder and
+json.dumps. "typed" is app.routers.boards.encode_board, which hands the BoardResponse shaped
+rows to pydantic-core in one pass.
+
+Run from the Backend directory:
+
+    python -m benchmarks.board_encoding --columns 10 --tasks 10 100 1000
+"""
+import argparse
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from app.routers.boards import BoardResponse, encode_board
+from app.routers.boards_db import Board, Column, Task
+
+
+def make_board(columns: int, tasks: int) -> tuple[Board, list[Column]]:
+    board = Board(id=1, title="bench board", version=1)
+    board_columns = [Column(id=c, board_id=1, title=f"column {c}", ord_num=c, tasks=[
+        Task(id=c * tasks + t, col_id=c, title=f"task {t}", body="body " * 20, ord_num=t)
+        for t in range(tasks)]) for c in range(columns)]
+    return board, board_columns
+
+
+def encode_generic(board: Board, board_columns: list[Column]) -> bytes:
+    content = jsonable_encoder({
+        "id": board.id,
+        "title": board.title,
+        "columns": [{
+            "boardId": col.board_id,
+            "id": col.id,
+            "orderNumber": col.ord_num,
+            "title": col.title,
+            "tasks": [{
+                "title": t.title,
+                "description": t.body,
+                "columnId": t.col_id,
+                "orderNumber": t.ord_num,
+                "id": t.id
+            } for t in col.tasks]
+        } for col in board_columns],
+    })
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def best_ms(func, *args, repeat: int) -> float:
+    number = max(1, 2000 // (len(args[1]) * max(1, len(args[1][0].tasks)) + 1))
+    return min(timeit.repeat(lambda: func(*args), number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tasks':>8}  {'bytes':>10}  {'generic ms':>12}  {'typed ms':>10}  {'speedup':>8}")
+    for tasks in args.tasks:
+        board, board_columns = make_board(args.columns, tasks)
+        assert json.loads(encode_generic(board, board_columns)) == json.loads(
+            encode_board(board, board_columns))
+        BoardResponse.model_validate_json(encode_board(board, board_columns))
+        generic = best_ms(encode_generic, board, board_columns, repeat=args.repeat)
+        typed = best_ms(encode_board, board, board_columns, repeat=args.repeat)
+        size = len(encode_board(board, board_columns))
+        print(f"{args.columns * tasks:>8}  {size:>10}  {generic:>12.2f}  {typed:>10.2f}  {generic / typed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Measures the cold start of the API: the time from starting a server process until it served
+its first request, and what that time is spent on.
+
+Each server (uvicorn with a single process, gunicorn with gunicorn.conf.py and one worker) is
+started --runs times on a freshly seeded and migrated database file (see benchmarks.api_load)
+and GET / is polled until it answers. "bytecode" runs the app from a copy without __pycache__
+and with PYTHONDONTWRITEBYTECODE, like a container whose image was built without compiling
+the app, so every start compiles the app modules again.
+
+The import of app.main is then broken down with python -X importtime into the self time of
+each top-level package and of each app module, and the schema work done at startup, the
+create_all of earlier releases against the version check, is timed in this process.
+
+Run from the Backend directory:
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
+
+from app.db import check_schema_version, sqlite_pragmas, use_sqlite_pragmas
+from app.migrations import migrate
+from benchmarks.api_load import seed
+from benchmarks.worker_scaling import free_port
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+
+def server_command(server: str, port: int) -> list[str]:
+    if server == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    return [sys.executable, "-m", "gunicorn", "-c", str(backend_dir / "gunicorn.conf.py")]
+
+
+def time_to_first_request(db_dir: str, server: str, app_dir: Path, bytecode: bool) -> float:
+    """
+    Starts the server and returns the seconds until GET / was answered.
+    """
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=str(app_dir), JOBAN_WORKERS="1", JOBAN_BIND=f"127.0.0.1:{port}")
+    if not bytecode:
+        env["PYTHONDONTWRITEBYTECODE"] = "1"
+    start = time.perf_counter()
+    process = subprocess.Popen(server_command(server, port), cwd=db_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < 60:
+                try:
+                    if client.get("/").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    time.sleep(0.005)
+        raise RuntimeError(f"{server} did not start")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def uncompiled_copy(directory: str) -> Path:
+    """
+    Copies the app without its bytecode cache, so the server has to compile it on import.
+    """
+    shutil.copytree(backend_dir / "app", Path(directory) / "app", ignore=shutil.ignore_patterns("__pycache__", "tests"))
+    shutil.copy(backend_dir / "gunicorn.conf.py", directory)
+    return Path(directory)
+
+
+def import_times(db_dir: str) -> tuple[Counter, Counter]:
+    """
+    Returns the self time in ms of importing app.main by top-level package and by app module.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=db_dir,
+                            env=dict(os.environ, PYTHONPATH=str(backend_dir)), capture_output=True, text=True,
+                            check=True)
+    packages, modules = Counter(), Counter()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name.split(".")[0] == "app":
+            modules[name] += int(self_us) / 1000
+    return packages, modules
+
+
+def schema_startup(db_path: str, runs: int) -> dict:
+    """
+    Times creating the missing tables as earlier releases did, against checking the version.
+    """
+    def median_ms(func) -> float:
+        samples = []
+        for _ in range(runs):
+            engine = create_engine(f"sqlite:///{db_path}")
+            start = time.perf_counter()
+            func(engine)
+            samples.append((time.perf_counter() - start) * 1000)
+            engine.dispose()
+        return statistics.median(samples)
+
+    return {"create_all": median_ms(SQLModel.metadata.create_all), "version check": median_ms(check_schema_version)}
+
+
+async def prepare(db_path: str, args):
+    migrate(db_path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    use_sqlite_pragmas(engine.sync_engine, sqlite_pragmas())
+    await seed(engine, args)
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--servers", nargs="+", default=["uvicorn", "gunicorn"])
+    parser.add_argument("--top", type=int, default=12, help="packages and modules listed in the import breakdown")
+    parser.add_argument("--boards", type=int, default=50)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir, tempfile.TemporaryDirectory() as copy_dir:
+        db_path = str(Path(db_dir) / "joban-data.db")
+        asyncio.run(prepare(db_path, args))
+        app_dirs = {True: backend_dir, False: uncompiled_copy(copy_dir)}
+
+        print(f"{'server':>10}  {'bytecode':>10}  {'median ms':>10}  {'max ms':>10}")
+        for server in args.servers:
+            for bytecode in (True, False):
+                samples = [time_to_first_request(db_dir, server, app_dirs[bytecode], bytecode) * 1000
+                           for _ in range(args.runs)]
+                print(f"{server:>10}  {'yes' if bytecode else 'no':>10}  {statistics.median(samples):>10.1f}  "
+                      f"{max(samples):>10.1f}", flush=True)
+
+        packages, modules = import_times(db_dir)
+        print(f"\nImport of app.main, self time in ms: {sum(packages.values()):.1f} total")
+        for name, ms in packages.most_common(args.top):
+            print(f"{name:>40}  {ms:>8.1f}")
+        print("\nApp modules:")
+        for name, ms in modules.most_common(args.top):
+            print(f"{name:>40}  {ms:>8.1f}")
+
+        print("\nSchema work at startup, median ms:")
+        for name, ms in schema_startup(db_path, args.runs).items():
+            print(f"{name:>40}  {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
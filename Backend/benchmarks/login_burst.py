@@ -0,0 +1,116 @@
+"""
+Measures the latency of ordinary requests while a burst of logins is hashing passwords.
+
+"pool" is app.routers.auth_passwords as configured, hashing on its bounded thread pool.
+"inline" runs the same scrypt calls on the event loop, as a hash inside the handler would.
+GET /auth/whoami is requested by --clients concurrent clients, first alone and then
+next to --logins concurrent clients logging in over and over.
+
+Run from the Backend directory:
+
+    python -m benchmarks.login_burst --clients 8 --logins 16 --duration 3
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import get_async_session
+from app.main import app
+from app.routers.auth_passwords import PasswordHasher, password_hasher
+from benchmarks.sqlite_profiles import percentile
+
+
+async def inline_hash(self, password: str, salt: str) -> str:
+    return self._scrypt(password, salt, self.n, self.r, self.p)
+
+
+async def inline_verify(self, password: str, salt: str, password_hash: str) -> bool:
+    return self._verify(password, salt, password_hash)
+
+
+async def whoami_loop(client: httpx.AsyncClient, cookies: dict, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        resp = await client.get("/auth/whoami", cookies=cookies)
+        assert resp.status_code == 200
+        latencies.append(time.perf_counter() - start)
+
+
+async def login_loop(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        resp = await client.post("/auth/login", json={"login": "bench", "password": "1234"})
+        assert resp.status_code == 200
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_phase(client: httpx.AsyncClient, cookies: dict, args, logins: int) -> dict:
+    stop = asyncio.Event()
+    other, login = [], []
+    tasks = [asyncio.create_task(whoami_loop(client, cookies, stop, other)) for _ in range(args.clients)]
+    tasks += [asyncio.create_task(login_loop(client, stop, login)) for _ in range(logins)]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return {
+        "whoami/s": len(other) / args.duration,
+        "whoami p50 ms": percentile(other, 50) * 1000,
+        "whoami p99 ms": percentile(other, 99) * 1000,
+        "logins/s": len(login) / args.duration,
+        "login p99 ms": percentile(login, 99) * 1000,
+    }
+
+
+async def run_mode(mode: str, args) -> list[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        SQLModel.metadata.create_all(create_engine(url))
+        engine = create_async_engine(url.replace("sqlite", "sqlite+aiosqlite", 1))
+
+        async def get_bench_session():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = get_bench_session
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            await client.post("/auth/register", json={
+                "first_name": "bench", "last_name": "user", "login": "bench", "password": "1234"})
+            cookies = dict((await client.post("/auth/login", json={"login": "bench", "password": "1234"})).cookies)
+            results = []
+            for phase, logins in [("idle", 0), ("login burst", args.logins)]:
+                results.append({"mode": mode, "phase": phase, **await run_phase(client, cookies, args, logins)})
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", default=["pool", "inline"])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=3)
+    args = parser.parse_args()
+
+    print(f"scrypt n={password_hasher.n} r={password_hasher.r} p={password_hasher.p}, "
+          f"{password_hasher.workers} hashing threads")
+    results = []
+    for mode in args.modes:
+        if mode == "inline":
+            PasswordHasher.hash, PasswordHasher.verify = inline_hash, inline_verify
+        results += asyncio.run(run_mode(mode, args))
+    keys = list(results[0])
+    print("  ".join(f"{k:>14}" for k in keys))
+    for r in results:
+        print("  ".join(f"{v:>14.1f}" if isinstance(v, float) else f"{v:>14}"
+                        for v in r.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compares SQLite pragma profiles from app.db on a mixed read/write load.
+
+Run from the Backend directory:
+
+    python -m benchmarks.sqlite_profiles --threads 8 --duration 5
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine, select, update
+
+from app.db import sqlite_profiles, use_sqlite_pragmas
+from app.routers.boards_db import Board, Column, Task
+
+
+def seed(engine, boards: int, columns: int, tasks: int):
+    with Session(engine) as session:
+        for b in range(boards):
+            session.add(Board(title=f"board {b}", columns=[
+                Column(title=f"column {c}", ord_num=c, tasks=[
+                    Task(title=f"task {t}", body="body " * 20, ord_num=t)
+                    for t in range(tasks)])
+                for c in range(columns)]))
+        session.commit()
+
+
+def worker(engine, stop: threading.Event, write_ratio: float, column_count: int,
+           task_count: int, latencies: dict, errors: list):
+    rnd = random.Random()
+    with Session(engine) as session:
+        while not stop.is_set():
+            is_write = rnd.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if is_write:
+                    session.exec(update(Task).where(Task.id == rnd.randint(1, task_count))
+                                 .values(title=f"task {rnd.random():.6f}"[:20]))
+                    session.commit()
+                else:
+                    session.exec(select(Task).where(
+                        Task.col_id == rnd.randint(1, column_count))).all()
+                    session.rollback()
+            except OperationalError:
+                session.rollback()
+                errors.append(1)
+                continue
+            latencies["write" if is_write else "read"].append(time.perf_counter() - start)
+
+
+def run_profile(profile: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}",
+                               connect_args={"check_same_thread": False},
+                               pool_size=args.threads)
+        use_sqlite_pragmas(engine, sqlite_profiles[profile])
+        SQLModel.metadata.create_all(engine)
+        seed(engine, args.boards, args.columns, args.tasks)
+
+        stop = threading.Event()
+        latencies = {"read": [], "write": []}
+        errors = []
+        threads = [threading.Thread(target=worker, args=(
+            engine, stop, args.write_ratio, args.boards * args.columns,
+            args.boards * args.columns * args.tasks, latencies, errors))
+            for _ in range(args.threads)]
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    ops = len(latencies["read"]) + len(latencies["write"])
+    return {
+        "profile": profile,
+        "ops/s": ops / args.duration,
+        "read p99 ms": percentile(latencies["read"], 99) * 1000,
+        "write p99 ms": percentile(latencies["write"], 99) * 1000,
+        "errors": len(errors),
+    }
+
+
+def percentile(values: list, p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[p - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profiles", nargs="+", default=list(sqlite_profiles))
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--boards", type=int, default=20)
+    parser.add_argument("--columns", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=50)
+    args = parser.parse_args()
+
+    results = [run_profile(profile, args) for profile in args.profiles]
+    keys = list(results[0])
+    print("  ".join(f"{k:>14}" for k in keys))
+    for r in results:
+        print("  ".join(f"{v:>14.1f}" if isinstance(v, float) else f"{v:>14}"
+                        for v in r.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Measures how throughput scales with the number of gunicorn worker processes.
+
+For each --workers count the API is served by gunicorn with gunicorn.conf.py on a freshly
+seeded database file (see benchmarks.api_load), and --clients load generator processes
+send the requests of each scenario over HTTP, --concurrency at a time each. Reads scale
+with the cores, writes stay serialized by SQLite's single writer; the errors column shows
+whether the lock coordination holds up. Throughput is the sum over the clients, p50/p99
+the worst client's.
+
+Run from the Backend directory:
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 8 --scenarios boards.get tasks.move
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db import sqlite_pragmas, use_sqlite_pragmas
+from app.migrations import migrate
+from benchmarks.api_load import board_patch, run_scenario, seed
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_dir: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, JOBAN_WORKERS=str(workers), JOBAN_BIND=f"127.0.0.1:{port}",
+               PYTHONPATH=str(backend_dir))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(backend_dir / "gunicorn.conf.py")],
+                              cwd=db_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def drive(base_url: str, ctx: dict, name: str, concurrency: int, requests: int) -> dict:
+    async def run():
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+            return await run_scenario(client, ctx, name, concurrency, requests)
+    return asyncio.run(run())
+
+
+async def prepare(db_dir: str, args) -> dict:
+    migrate(str(Path(db_dir) / "joban-data.db"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{Path(db_dir) / 'joban-data.db'}")
+    use_sqlite_pragmas(engine.sync_engine, sqlite_pragmas())
+    ctx = await seed(engine, args)
+    await engine.dispose()
+    return ctx
+
+
+async def board_state(base_url: str, ctx: dict) -> tuple[dict, dict]:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        patch = await board_patch(client, ctx, ctx["boards"][0])
+        etags = {board_id: (await client.get(f"/boards/{board_id}", cookies=ctx["cookies"])).headers["ETag"]
+                 for board_id in ctx["boards"]}
+    return patch, etags
+
+
+def run_workers(workers: int, args) -> list[dict]:
+    results = []
+    per_client = args.requests // args.clients
+    with tempfile.TemporaryDirectory() as db_dir:
+        ctx = asyncio.run(prepare(db_dir, args))
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(db_dir, workers, port)
+        try:
+            ctx["patch"], ctx["etags"] = asyncio.run(board_state(base_url, ctx))
+            with multiprocessing.Pool(args.clients) as pool:
+                for name in args.scenarios:
+                    # Each client logs out its own share of the spare tokens
+                    parts = pool.starmap(drive, [
+                        (base_url, {**ctx, "spare_tokens": iter(range(1 + i * per_client, 1 + (i + 1) * per_client))},
+                         name, args.concurrency, per_client) for i in range(args.clients)])
+                    results.append({
+                        "workers": workers,
+                        "scenario": name,
+                        "req/s": sum(p["req/s"] for p in parts),
+                        "p50 ms": max(p["p50 ms"] for p in parts),
+                        "p99 ms": max(p["p99 ms"] for p in parts),
+                        "errors": sum(p["errors"] for p in parts),
+                    })
+                    print_row(results[-1])
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+columns = ["workers", "scenario", "req/s", "p50 ms", "p99 ms", "errors"]
+
+
+def print_row(row: dict, keys: list[str] = columns):
+    print("  ".join(f"{row[k]:>10.1f}" if isinstance(row[k], float) else f"{row[k]:>16}"
+                    if k == "scenario" else f"{row[k]:>10}" for k in keys), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", nargs="+", type=int, default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--scenarios", nargs="+", default=["boards.get", "boards.list", "tasks.search",
+                                                           "tasks.move", "tasks.batch"])
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per client")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--boards", type=int, default=50)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=5000)
+    args = parser.parse_args()
+
+    print("  ".join(f"{k:>16}" if k == "scenario" else f"{k:>10}" for k in columns))
+    results = []
+    for workers in args.workers:
+        results += run_workers(workers, args)
+
+    print(f"\nThroughput relative to {args.workers[0]} worker(s):")
+    print("  ".join(f"{k:>16}" if k == "scenario" else f"{k:>10}" for k in ["workers", "scenario", "speedup"]))
+    base = {r["scenario"]: r["req/s"] for r in results if r["workers"] == args.workers[0]}
+    for row in results:
+        print_row({**row, "speedup": row["req/s"] / base[row["scenario"]]}, ["workers", "scenario", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for serving the API with several worker processes. Run from the Backend directory:
+
+    gunicorn
+
+The app is imported once in the master (preload_app), which checks that the database was
+migrated (python -m app.migrations) before the workers are forked. Each worker runs the app
+on uvicorn's event loop. The database file is JOBAN_DB_PATH, joban-data.db in the working
+directory by default; the container image keeps it on the /data volume and migrates it
+before starting gunicorn.
+
+Signals to the master:
+    HUP   starts new workers and stops the old ones gracefully, letting them finish their
+          requests within graceful_timeout. The preloaded app is kept, so new code needs:
+    USR2  starts a new master with the new code next to the old one, then
+    QUIT  to the old master stops it gracefully.
+    TTIN/TTOU  add or remove a worker.
+
+SQLite takes one writer at a time across all workers: the database runs in WAL mode with
+a busy timeout (JOBAN_SQLITE_PROFILE=performance), writing requests begin their
+transaction with BEGIN IMMEDIATE and requests failing with "database is locked" are
+retried, see app.db.LockRetryRoute. With more than one worker, board events are read
+from the change log every JOBAN_EVENTS_POLL_INTERVAL seconds, so subscribers get the
+writes of all workers. Token and board caches stay per worker. Board responses are cached
+by version, which every request reads from the database. A logout only drops the token
+from the cache of its own worker, so the token cache lives at most max_token_cache_ttl
+seconds with more than one worker: that bounds how long a revoked token still works.
+"""
+import os
+
+workers = int(os.environ.get("JOBAN_WORKERS", str(os.cpu_count() or 1)))
+max_token_cache_ttl = 1.0
+if workers > 1:
+    # Read by app.routers.board_events and app.routers.auth_cache, which are imported after this file
+    os.environ.setdefault("JOBAN_EVENTS_POLL_INTERVAL", "0.05")
+    os.environ["JOBAN_TOKEN_CACHE_TTL"] = str(min(float(os.environ.get("JOBAN_TOKEN_CACHE_TTL", "60")),
+                                                  max_token_cache_ttl))
+
+from app.db import check_schema_version  # noqa: E402
+
+wsgi_app = "app.main:app"
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = os.environ.get("JOBAN_BIND", "0.0.0.0:8000")
+preload_app = True
+graceful_timeout = int(os.environ.get("JOBAN_GRACEFUL_TIMEOUT", "30"))
+# Restarting workers now and then bounds the growth of their caches and any leaks
+max_requests = int(os.environ.get("JOBAN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("JOBAN_ACCESS_LOG")
+
+
+def on_starting(server):
+    check_schema_version()